@@ -0,0 +1,116 @@
+"""
+Benchmark of the market engines, timing the turns of a market
+fed with reports by synthetic houses
+"""
+import contextlib
+import os
+import sys
+from multiprocessing import Array, Barrier, Process, Value
+from random import uniform
+from time import perf_counter
+
+from colorama import Fore, Style
+
+from server import MARKET_ENGINES
+from server_utils.housetable import HouseTable
+from server_utils.sharedvars import SharedVariables, HISTORY_SIZE, HISTORY_FIELDS
+from server_utils.transport import Transport, get_transport
+
+BENCHMARK_IPC_KEY = 96  # Queue used by the sysv backend, apart from the server ones
+BENCHMARK_PRICE = 0.15  # Price of a kWh, constant as the market doesn't write its turns
+
+
+def feed(transport: Transport, nb_houses: int, turns: int) -> None:
+    """
+    Plays every house : sends all the reports of a turn, then waits for all the bills
+    """
+    for _ in range(turns):
+        for house in range(1, nb_houses + 1):
+            transport.send_report(house, str(uniform(-100, 100)).encode())
+        for house in range(1, nb_houses + 1):
+            transport.receive_bill(house)
+
+
+def benchmark(
+    engine: str, transport: Transport, table: HouseTable, turns: int, result: Value
+) -> None:
+    """
+    Times the turns of a market, in its own process so that engines don't interfere
+    :param table: the houses, whose types the market reads
+    :param result: shared value receiving the number of transactions per second
+    """
+    shared_variables = SharedVariables(
+        compute_barrier=Barrier(1),
+        write_barrier=Barrier(1),
+        price_shared=Array("d", [BENCHMARK_PRICE] * 2),
+        weather_shared=Array("i", [25, 20] * 2),
+        turn_shared=Value("i"),
+        history_shared=Array("d", HISTORY_SIZE * HISTORY_FIELDS),
+    )
+
+    # A long time interval keeps the external factors quiet during the benchmark
+    market = MARKET_ENGINES[engine](
+        shared_variables=shared_variables,
+        politics=100,
+        economy=100,
+        table=table,
+        transport=transport,
+        time_interval=3600,
+    )
+
+    # Only time the market, not the display of every transaction
+    with open(os.devnull, "w") as devnull, contextlib.redirect_stdout(devnull):
+        start = perf_counter()
+        for _ in range(turns):
+            market.update()
+        elapsed = perf_counter() - start
+
+    market.politics_process.kill()
+    market.economics_process.kill()
+
+    result.value = table.size * turns / elapsed
+
+
+# Takes the transport backend, the number of turns and the numbers of houses to try
+if __name__ == "__main__":
+    if len(sys.argv) < 4:
+        print(
+            "Usage : python benchmark_market.py <sysv|pipe|ring> <turns> <nb_houses>..."
+        )
+        sys.exit(1)
+
+    BACKEND = sys.argv[1]
+    TURNS = int(sys.argv[2])
+
+    print(f"Market engines over the {BACKEND} transport, {TURNS} turns")
+    print(
+        "houses".rjust(8), *(engine.rjust(14) for engine in MARKET_ENGINES), "speedup"
+    )
+
+    for NB_HOUSES in map(int, sys.argv[3:]):
+        throughputs = []
+        for ENGINE in MARKET_ENGINES:
+            house_transport = get_transport(BACKEND, BENCHMARK_IPC_KEY, NB_HOUSES, 1024)
+            throughput = Value("d")
+            table = HouseTable.generate(NB_HOUSES, 0, 0)
+            processes = [
+                Process(
+                    target=benchmark,
+                    args=(ENGINE, house_transport, table, TURNS, throughput),
+                ),
+                Process(target=feed, args=(house_transport, NB_HOUSES, TURNS)),
+            ]
+            for process in processes:
+                process.start()
+            for process in processes:
+                process.join()
+
+            house_transport.remove()
+            throughputs.append(throughput.value)
+
+        print(
+            str(NB_HOUSES).rjust(8),
+            *(f"{'{:.0f}'.format(value)} tx/s".rjust(14) for value in throughputs),
+            f"{Fore.CYAN}x{'{:.2f}'.format(throughputs[1] / throughputs[0])}"
+            f"{Style.RESET_ALL}",
+        )
@@ -1,9 +1,13 @@
 """
 Simulation client, used to give orders to the server_utils
 """
+import socket
 import sys
 import sysv_ipc
 
+from server_utils.transport import SysVTransport
+from server_utils.gateway import send_frame, receive_frame
+
 
 class Client:
     """
@@ -12,13 +16,25 @@ class Client:
 
     def __init__(self, key: int):
         try:
-            self.message_queue = sysv_ipc.MessageQueue(key)
+            self.message_queue = SysVTransport(key)
         except sysv_ipc.ExistentialError:
             print(f"Cannot connect to message queue {key}, terminating.")
             sys.exit(1)
 
+        Client.welcome()
+
+    @staticmethod
+    def welcome() -> None:
+        """
+        Tells the user which requests are available
+        """
         print(
-            'Connection established. Enter "report" to see the current state of the simulation,'
+            'Connection established. Enter "report" to see the current state of the simulation, '
+            '"history" to see the last turns, "stats" to see the transport metrics, '
+            '"types" to see the bills by household type, "top" to see the biggest '
+            'consumers and producers, "energy" to see the energy given and sold, '
+            '"analytics" to see the statistics of the run, '
+            '"fork <n>" to play n what-if branches from the current turn, '
             'or "end" to end the simulation'
         )
 
@@ -31,41 +47,262 @@ class Client:
         message = message.encode()
 
         # Send the message
-        self.message_queue.send(message=message, type=1)
+        try:
+            self.message_queue.send(message, 1)
+        except sysv_ipc.ExistentialError:
+            return "end"  # The server was interrupted and removed the queue
 
         # Wait for a response
-        server_response, _ = self.message_queue.receive(type=2)
+        try:
+            server_response, _ = self.message_queue.receive(2)
+        except sysv_ipc.ExistentialError:
+            return "end"  # The server was interrupted and removed the queue
         return server_response.decode()
 
+    def close(self) -> None:
+        """
+        Deletes the message queue once the server is terminated
+        """
+        self.message_queue.remove()
+
     @staticmethod
-    def process(message: str) -> str:
+    def process(request: str, message: str) -> str:
         """
         Process the message received by the server
+        :param request: the request the message answers
+        :param message: the message sent back by the server
         """
         if message == "end":
             return "Server terminated, deleting the message queue"
         if message == "error":
             return "Server couldn't process the request"
 
-        # Explicit format for server reports
-        # "price;temp;coverage"
-        price, temp, coverage = message.split(";")
-        return f"Price of kWh : {price}€/kWh ── Temperature : {temp}°C ── Cloud coverage : {coverage}%"
+        # "fork <n>" is answered as "fork", other requests as a report
+        return FORMATS.get(request.split(" ")[0], format_report)(message)
+
+
+def format_report(message: str) -> str:
+    """
+    :param message: "price;temp;coverage"
+    :return: the current state of the simulation
+    """
+    price, temp, coverage = message.split(";")
+    return f"Price of kWh : {price}€/kWh ── Temperature : {temp}°C ── Cloud coverage : {coverage}%"
+
+
+def format_history(message: str) -> str:
+    """
+    :param message: "turn,price,temp,coverage;..."
+    :return: the last turns, one per line
+    """
+    lines = []
+    for entry in message.split(";"):
+        turn, price, temp, coverage = entry.split(",")
+        lines.append(
+            f"Turn {turn} ── Price of kWh : {price}€/kWh ── "
+            f"Temperature : {temp}°C ── Cloud coverage : {coverage}%"
+        )
+    return "\n   ".join(lines)
+
+
+def format_stats(message: str) -> str:
+    """
+    :param message: "turn;backend;capacity;pending;high_water;blocked_sends;blocked_time;
+                     overruns;lateness;max_lateness"
+    :return: the transport metrics and the overruns
+    """
+    (
+        turn,
+        backend,
+        capacity,
+        pending,
+        high_water,
+        blocked,
+        blocked_time,
+        overruns,
+        lateness,
+        max_lateness,
+    ) = message.split(";")
+    return (
+        f"Turn {turn} ── Transport {backend} : {pending} pending, "
+        f"high water {high_water}, capacity {capacity} ── "
+        f"{blocked} blocked sends ({blocked_time}s) ── "
+        f"{overruns} overrun turns ({lateness}s late, at most {max_lateness}s)"
+    )
+
+
+def settled(format_turn):
+    """
+    Formats the statistics of the last settled turn, sent as "turn;field;..."
+    with a negative turn while no turn is settled
+    :param format_turn: function formatting the turn and its list of fields
+    :return: the function formatting the message
+    """
+
+    def format_message(message: str) -> str:
+        turn, *fields = message.split(";")
+        if int(turn) < 0:
+            return "No turn settled yet"
+        return format_turn(turn, fields)
+
+    return format_message
+
+
+@settled
+def format_types(turn: str, fields: list) -> str:
+    """
+    :param turn: the last settled turn
+    :param fields: "type,houses,consumption,mean consumption,bills,mean bill" per type
+    :return: the bills by household type, one type per line
+    """
+    lines = [f"Turn {turn}"]
+    for entry in fields:
+        name, count, consumption, mean_consumption, bills, mean_bill = entry.split(",")
+        lines.append(
+            f"{name} : {count} houses ── Consumed : {consumption} kWh "
+            f"({mean_consumption} kWh each) ── Bills : {bills}€ "
+            f"({mean_bill}€ each)"
+        )
+    return "\n   ".join(lines)
+
+
+@settled
+def format_top(turn: str, fields: list) -> str:
+    """
+    :param turn: the last settled turn
+    :param fields: "house,kWh,house,kWh..." for the consumers, then the producers
+    :return: the biggest consumers and producers
+    """
+    lines = [f"Turn {turn}"]
+    for label, ranking in zip(("Consumers", "Producers"), fields):
+        values = ranking.split(",") if ranking else []
+        houses = [
+            f"house {house} ({energy} kWh)"
+            for house, energy in zip(values[::2], values[1::2])
+        ]
+        lines.append(f"{label} : {', '.join(houses) or 'none'}")
+    return "\n   ".join(lines)
+
+
+@settled
+def format_energy(turn: str, fields: list) -> str:
+    """
+    :param turn: the last settled turn
+    :param fields: the energy given away and sold
+    :return: the energy given and sold
+    """
+    given, sold = fields
+    return f"Turn {turn} ── Given away : {given} kWh ── Sold : {sold} kWh"
+
+
+def format_analytics(message: str) -> str:
+    """
+    :param message: "name,count,ewma,ew_std,mean,std;..." for the price and consumption
+                    series, then "name,count,p50,p90,p99;..." for the bills and
+                    consumption sketches
+    :return: the statistics of the run, one series or sketch per line
+    """
+    entries = [entry.split(",") for entry in message.split(";")]
+    lines = []
+    for name, count, ewma, ew_std, mean, std in entries[:2]:
+        lines.append(
+            f"{name.capitalize()} per turn ({count} turns) ── "
+            f"EWMA : {ewma} ± {ew_std} ── Rolling mean : {mean} ± {std}"
+        )
+    for name, count, median, ninetieth, ninety_ninth in entries[2:]:
+        lines.append(
+            f"{name.capitalize()} of the houses ({count} values) ── "
+            f"Median : {median} ── 90th : {ninetieth} ── 99th : {ninety_ninth}"
+        )
+    return "\n   ".join(lines)
+
+
+def format_fork(message: str) -> str:
+    """
+    :param message: "turn;name,last turn,price,mean price,consumption,bills,politics,economy;..."
+    :return: the results of the branches, one per line
+    """
+    turn, *branches = message.split(";")
+    lines = [f"Branches forked at turn {turn}"]
+    for branch in branches:
+        (
+            name,
+            last_turn,
+            price,
+            mean_price,
+            consumption,
+            bills,
+            politics,
+            economy,
+        ) = branch.split(",")
+        lines.append(
+            f"{name} : turn {last_turn} ── Price of kWh : {price}€/kWh "
+            f"(mean {mean_price}€/kWh) ── Consumed : {consumption} kWh ── "
+            f"Bills : {bills}€ ── Politics {politics}/100, Economy {economy}/100"
+        )
+    return "\n   ".join(lines)
+
+
+# Formatting of the response to each request, a report by default
+FORMATS = {
+    "history": format_history,
+    "stats": format_stats,
+    "types": format_types,
+    "top": format_top,
+    "energy": format_energy,
+    "analytics": format_analytics,
+    "fork": format_fork,
+}
+
+
+class TcpClient(Client):
+    """
+    Client communicating with the server_utils through its TCP gateway,
+    which can run on another machine
+    """
+
+    def __init__(self, host: str, port: int):  # pylint: disable=super-init-not-called
+        try:
+            self.connection = socket.create_connection((host, port))
+        except OSError:
+            print(f"Cannot connect to gateway {host}:{port}, terminating.")
+            sys.exit(1)
+
+        Client.welcome()
+
+    def send_mq(self, message: str) -> str:
+        """
+        sends a message to the gateway and wait for it to respond
+        :param message: a string message
+        :return: the message sent back by the server
+        """
+        send_frame(self.connection, message)
+        return receive_frame(self.connection)
+
+    def close(self) -> None:
+        """
+        Closes the connection, the message queue belongs to the local client
+        """
+        self.connection.close()
 
 
 # Main client loop*
-# takes an only argument, the ipc key id to communicate with the server_utils
+# takes an only argument, the ipc key id to communicate with the server_utils,
+# or the host:port of its gateway
 if __name__ == "__main__":
     IPC_KEY = 128
 
-    if len(sys.argv) == 2:
-        IPC_KEY = int(sys.argv[1])
-
-    client = Client(IPC_KEY)
+    if len(sys.argv) == 2 and ":" in sys.argv[1]:
+        HOST, PORT = sys.argv[1].rsplit(":", 1)
+        client = TcpClient(HOST, int(PORT))
+    else:
+        if len(sys.argv) == 2:
+            IPC_KEY = int(sys.argv[1])
+        client = Client(IPC_KEY)
 
     # Stops when response = "end"
-    while (response := client.send_mq(input(" > "))) != "end":
-        print(" >", Client.process(response))
+    while (response := client.send_mq(request := input(" > "))) != "end":
+        print(" >", Client.process(request, response))
 
-    client.message_queue.remove()
+    client.close()
     print("client stopped")
@@ -0,0 +1,56 @@
+"""
+Converts a CSV series into a trace file replayed by the simulation,
+one row per turn, streamed so that long series don't have to fit in memory
+"""
+import csv
+import sys
+
+from server_utils.trace import HEADER, MAGIC, WEATHER_RECORD, HOUSE_RECORD
+
+# Weather rows : temperature,cloud_coverage
+# House rows : consumption_1,production_1,...,consumption_N,production_N
+RECORDS = {"weather": (WEATHER_RECORD, int), "houses": (HOUSE_RECORD, float)}
+
+
+def convert(kind: str, source: str, destination: str) -> int:
+    """
+    :param kind: weather or houses
+    :param source: path of the CSV file, without header
+    :param destination: path of the trace file
+    :return: the number of turns written
+    """
+    record, field_type = RECORDS[kind]
+    nb_fields = len(record.unpack(bytes(record.size)))
+    turns = 0
+
+    with open(source, newline="") as csv_file, open(destination, "wb") as trace:
+        records_per_turn = None
+        for line, row in enumerate(csv.reader(csv_file), start=1):
+            if not row:
+                continue
+
+            if records_per_turn is None:
+                records_per_turn = len(row) // nb_fields
+                trace.write(HEADER.pack(MAGIC, records_per_turn, record.size))
+
+            if len(row) != records_per_turn * nb_fields:
+                raise ValueError(f"Line {line} has {len(row)} fields")
+
+            values = list(map(field_type, row))
+            for index in range(0, len(values), nb_fields):
+                trace.write(record.pack(*values[index : index + nb_fields]))
+            turns += 1
+
+    return turns
+
+
+# Takes the kind of trace, the CSV file and the trace file
+if __name__ == "__main__":
+    if len(sys.argv) != 4 or sys.argv[1] not in RECORDS:
+        print(
+            "Usage : python convert_trace.py <weather|houses> <input.csv> <output.bin>"
+        )
+        sys.exit(1)
+
+    TURNS = convert(*sys.argv[1:])
+    print(f"{TURNS} turns written to {sys.argv[3]}")
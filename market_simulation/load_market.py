@@ -0,0 +1,237 @@
+"""
+Load generator for the market : a few processes play many synthetic houses,
+sending their reports at a target rate and checking the bills they get back,
+to find the throughput at which the market saturates
+"""
+import json
+import sys
+from array import array
+from collections import deque
+from multiprocessing import Array, Barrier, Process, Value
+from random import Random
+from time import monotonic, sleep
+
+from colorama import Fore, Style
+
+from benchmark_market import BENCHMARK_PRICE, benchmark
+from server_utils.housetable import HouseTable
+from server_utils.transport import Transport, TransportBusy, get_transport
+
+# Fields of each generator in the results : bills, wrong bills, total latency
+RESULT_FIELDS = 3
+
+# Queue used by the sysv backend, apart from the server and benchmark ones
+LOAD_IPC_KEY = 97
+
+
+def draw_consumption(random: Random, consumption: dict) -> float:
+    """
+    :param random: the random generator of the process
+    :param consumption: the distribution of the consumption minus production,
+                        "normal" or "uniform" around a mean
+    :return: a consumption in kWh, negative for a production surplus
+    """
+    if consumption["distribution"] == "normal":
+        return random.gauss(consumption["mean"], consumption["deviation"])
+    return random.uniform(
+        consumption["mean"] - consumption["deviation"],
+        consumption["mean"] + consumption["deviation"],
+    )
+
+
+def check_bill(behaviour: int, consumption: float, bill: float) -> bool:
+    """
+    Checks a bill is consistent with the report of the house. The free energy
+    a house gets depends on the order of the transactions, so only bounds are known
+    :param behaviour: the type of the house
+    :param consumption: the consumption it reported
+    :param bill: the bill it got
+    :return: True if the bill is valid
+    """
+    full_price = consumption * BENCHMARK_PRICE
+    tolerance = 1e-6 * max(1.0, abs(full_price))
+
+    if consumption > 0:  # Pays at most its whole consumption
+        return -tolerance <= bill <= full_price + tolerance
+    if behaviour == 1:  # Gives away its surplus
+        return abs(bill) <= tolerance
+    if behaviour == 2:  # Sells its surplus
+        return abs(bill - full_price) <= tolerance
+    return full_price - tolerance <= bill <= tolerance  # Sells what wasn't taken
+
+
+def generate(
+    transport: Transport,
+    table: HouseTable,
+    houses: range,
+    load: dict,
+    rate: float,
+    results: Array,
+    slot: int,
+    turn_barrier: Barrier,
+) -> None:
+    """
+    Plays some houses : sends their reports at a given rate, turn after turn,
+    and collects their bills
+    :param table: the houses, whose types the market reads
+    :param houses: the pids of the houses played by the process
+    :param load: the load configuration
+    :param rate: number of reports per second sent by the process
+    :param results: shared array receiving the bills, wrong bills and total latency
+    :param slot: the index of the process in the results
+    :param turn_barrier: barrier of the generators, starting the turns together
+    """
+    random = Random(houses.start)
+    bills = errors = latency = 0
+
+    def collect(reports: deque, block: bool) -> None:
+        # Bills mostly come back in the order of the reports
+        nonlocal bills, errors, latency
+        while reports:
+            house, consumption, sent = reports[0]
+            try:
+                bill = float(transport.receive_bill(house, block).decode())
+            except TransportBusy:
+                return
+            reports.popleft()
+            bills += 1
+            errors += not check_bill(table.types[house - 1], consumption, bill)
+            latency += monotonic() - sent
+
+    deadline = monotonic()
+    for _ in range(load["turns"]):
+        # The market counts a turn in reports : a generator done early would
+        # have its next reports settled with the turn the others are still in
+        turn_barrier.wait()
+
+        reports = deque()
+        giveaways = deque()  # Houses of type 3 are only billed at the end of the turn
+
+        for house in houses:
+            # Only sleep when ahead of the schedule, short sleeps would slow the sending down
+            deadline += 1 / rate
+            if (delay := deadline - monotonic()) > 0.001:
+                sleep(delay)
+
+            consumption = draw_consumption(random, load["consumption"])
+            transport.send_report(house, str(consumption).encode())
+
+            if table.types[house - 1] == 3 and consumption <= 0:
+                giveaways.append((house, consumption, monotonic()))
+            else:
+                reports.append((house, consumption, monotonic()))
+            collect(reports, block=False)
+
+        collect(reports, block=True)
+        collect(giveaways, block=True)
+
+    results[slot * RESULT_FIELDS : (slot + 1) * RESULT_FIELDS] = [
+        bills,
+        errors,
+        latency,
+    ]
+
+
+def run(backend: str, ipc_key: int, engine: str, load: dict, rate: float) -> tuple:
+    """
+    Runs a market against the generators at a target rate
+    :param rate: total number of reports per second
+    :return: the throughput of the market in transactions per second,
+             the mean bill latency in seconds and the number of wrong bills
+    """
+    nb_houses = load["nb_houses"]
+    nb_processes = load["processes"]
+    transport = get_transport(backend, ipc_key, nb_houses, 1024)
+
+    # Types of the houses, following the weights of the mix
+    types = Random(0).choices((1, 2, 3), load["mix"], k=nb_houses)
+    table = HouseTable(array("b", types), array("d", [0]) * nb_houses, 0)
+    throughput = Value("d")
+    results = Array("d", nb_processes * RESULT_FIELDS)
+    turn_barrier = Barrier(nb_processes)
+
+    # Split the houses between the generators
+    bounds = [
+        1 + nb_houses * index // nb_processes for index in range(nb_processes + 1)
+    ]
+    processes = [
+        Process(
+            target=benchmark,
+            args=(engine, transport, table, load["turns"], throughput),
+        )
+    ]
+    processes.extend(
+        Process(
+            target=generate,
+            args=(
+                transport,
+                table,
+                range(bounds[slot], bounds[slot + 1]),
+                load,
+                rate / nb_processes,
+                results,
+                slot,
+                turn_barrier,
+            ),
+        )
+        for slot in range(nb_processes)
+    )
+
+    for process in processes:
+        process.start()
+    for process in processes:
+        process.join()
+    transport.remove()
+
+    bills = sum(results[0::RESULT_FIELDS])
+    errors = sum(results[1::RESULT_FIELDS])
+    latency = sum(results[2::RESULT_FIELDS])
+    return throughput.value, latency / max(1, bills), int(errors)
+
+
+# Takes the configuration file, whose server, market and load sections are used
+if __name__ == "__main__":
+    with open(sys.argv[1] if len(sys.argv) > 1 else "config.json") as file:
+        CONFIG = json.load(file)
+    LOAD = CONFIG["load"]
+    BACKEND = CONFIG["server"]["transport"]
+
+    print(
+        f"Market {CONFIG['market']['engine']} over the {BACKEND} transport, "
+        f"{LOAD['nb_houses']} houses played by {LOAD['processes']} processes, "
+        f"{LOAD['turns']} turns"
+    )
+    print("target".rjust(12), "throughput".rjust(14), "latency".rjust(10), "errors")
+
+    BEST = 0
+    SATURATION = None
+    for RATE in LOAD["rates"]:
+        THROUGHPUT, LATENCY, ERRORS = run(
+            BACKEND,
+            LOAD_IPC_KEY,
+            CONFIG["market"]["engine"],
+            LOAD,
+            RATE,
+        )
+        BEST = max(BEST, THROUGHPUT)
+        print(
+            f"{RATE} tx/s".rjust(12),
+            f"{'{:.0f}'.format(THROUGHPUT)} tx/s".rjust(14),
+            f"{'{:.2f}'.format(LATENCY * 1000)} ms".rjust(10),
+            f"{Fore.RED if ERRORS else Fore.GREEN}{ERRORS}{Style.RESET_ALL}",
+        )
+
+        # The market saturates once it can't keep up with the target rate
+        if THROUGHPUT < LOAD["saturation"] * RATE:
+            SATURATION = RATE
+            break
+
+    if SATURATION is None:
+        print(
+            f"{Fore.CYAN}No saturation, up to {'{:.0f}'.format(BEST)} tx/s{Style.RESET_ALL}"
+        )
+    else:
+        print(
+            f"{Fore.CYAN}Saturated at a target of {SATURATION} tx/s, "
+            f"best throughput {'{:.0f}'.format(BEST)} tx/s{Style.RESET_ALL}"
+        )
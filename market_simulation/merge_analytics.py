@@ -0,0 +1,41 @@
+"""
+Merges the sketches dumped at the end of several runs, or by several markets,
+and prints the quantiles of the whole ensemble
+"""
+import json
+import sys
+
+from server_utils.analytics import QUANTILES, Sketch
+
+# Takes the analytics dumps to merge
+if __name__ == "__main__":
+    if len(sys.argv) < 2:
+        print("Usage : python merge_analytics.py <analytics.json>...")
+        sys.exit(1)
+
+    SKETCHES = {}
+    for path in sys.argv[1:]:
+        with open(path) as file:
+            for name, dump in json.load(file)["sketches"].items():
+                SKETCH = Sketch.load(dump)
+                if name not in SKETCHES:
+                    SKETCHES[name] = SKETCH
+                elif SKETCHES[name].compatible(SKETCH):
+                    SKETCHES[name].merge(SKETCH.shared[:])
+                else:
+                    print(
+                        f"The {name} sketch of {path} doesn't have the accuracy "
+                        "and bounds of the previous ones, it can't be merged"
+                    )
+                    sys.exit(1)
+
+    print(f"{len(sys.argv) - 1} dumps merged")
+    for name, sketch in SKETCHES.items():
+        count, values = sketch.quantiles(QUANTILES)
+        print(
+            f"{name.capitalize()} ({count} values) ── "
+            + " ── ".join(
+                f"{'{:.0f}'.format(quantile * 100)}th : {'{:.2f}'.format(value)}"
+                for quantile, value in zip(QUANTILES, values)
+            )
+        )
@@ -0,0 +1,92 @@
+"""
+Remote city, simulating houses on another machine
+which exchange with the market through the server gateway
+"""
+import asyncio
+import sys
+from random import randint, random
+
+from colorama import Fore, Style
+
+from server_utils.gateway import read_frame, write_frame
+from server_utils.home import Home
+
+
+async def remote_home(host: str, port: int, home_pid: int, max_prod: int) -> None:
+    """
+    Simulates a house, turn after turn, over its own connection to the gateway
+    :param host: the gateway host
+    :param port: the gateway port
+    :param home_pid: the pid of the house, given by the server configuration
+    :param max_prod: maximum average production of the house
+    """
+    house_type = randint(1, 3)
+    base_production = int(max_prod * random())
+    production = base_production
+
+    reader, writer = await asyncio.open_connection(host, port)
+
+    while True:
+        # Wait for the next turn and check the local weather
+        await write_frame(writer, f"weather;{home_pid}")
+        if (weather := await read_frame(reader)) == "error":
+            break
+        temperature, cloud_coverage = map(int, weather.split(";"))
+
+        production = Home.get_prod(
+            base_production, production, temperature, cloud_coverage
+        )
+        total = Home.get_cons(temperature) - production
+
+        # Report to the market and get the bill
+        await write_frame(writer, f"house;{home_pid};{house_type};{total}")
+        if (bill := await read_frame(reader)) == "error":
+            break
+        Home.print_bill(home_pid, house_type, float(bill), total)
+
+    print(f"{Fore.RED}Gateway refused house {home_pid}{Style.RESET_ALL}")
+    writer.close()
+
+
+async def remote_city(
+    host: str, port: int, first_pid: int, nb_houses: int, max_prod: int
+) -> None:
+    """
+    Runs every house of the remote city in the same event loop
+    """
+    await asyncio.gather(
+        *(
+            remote_home(host, port, home_pid, max_prod)
+            for home_pid in range(first_pid, first_pid + nb_houses)
+        )
+    )
+
+
+# Takes the gateway address and the range of pids of the houses,
+# which must be within the remote houses declared in the server configuration
+if __name__ == "__main__":
+    if len(sys.argv) not in (5, 6):
+        print(
+            "Usage : python remote_city.py <host> <port> <first_pid> <nb_houses> [max_prod]"
+        )
+        sys.exit(1)
+
+    MAX_PROD = int(sys.argv[5]) if len(sys.argv) == 6 else 200
+
+    print(
+        f"\nStarting remote city with houses {sys.argv[3]} "
+        f"to {int(sys.argv[3]) + int(sys.argv[4]) - 1}"
+    )
+
+    try:
+        asyncio.run(
+            remote_city(
+                sys.argv[1],
+                int(sys.argv[2]),
+                int(sys.argv[3]),
+                int(sys.argv[4]),
+                MAX_PROD,
+            )
+        )
+    except (KeyboardInterrupt, ConnectionError, asyncio.IncompleteReadError):
+        print(f"{Fore.RED}Stopping remote city{Style.RESET_ALL}")
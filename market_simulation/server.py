@@ -2,21 +2,41 @@
 Server class for the market simulation
 Configured by a json file
 """
+import atexit
 import sys
 import signal
 import json
+from random import getrandbits
 from time import sleep
-from multiprocessing import Array, Barrier, Value
+from multiprocessing import Array, Barrier, Value, active_children
 
-import sysv_ipc
 from colorama import Fore, Style, Back
 
-from server_utils.sharedvars import SharedVariables  # pylint-disable-import-error
+from server_utils.sharedvars import (  # pylint-disable-import-error
+    SharedVariables,
+    HISTORY_SIZE,
+    HISTORY_FIELDS,
+)
+from server_utils.transport import SysVTransport, TransportBusy, get_transport
+from server_utils.gateway import Gateway
+from server_utils.shutdown import Shutdown
+from server_utils.placement import Placement
+from server_utils.scheduler import Scheduler
+from server_utils.soak import SoakMonitor
+from server_utils.trace import Trace, WEATHER_RECORD, HOUSE_RECORD
+from server_utils.housetable import HouseTable
 from server_utils.sync import ServerSync
 from server_utils.market import Market
+from server_utils.asyncmarket import AsyncMarket
+from server_utils.analytics import Analytics, QUANTILES
+from server_utils.branch import Branch
 from server_utils.city import City
+from server_utils.home import TYPES
 from server_utils.weather import Weather
 
+# Engines the market can run its transactions with
+MARKET_ENGINES = {"threads": Market, "asyncio": AsyncMarket}
+
 
 class Server:
     """
@@ -26,84 +46,296 @@ class Server:
     """
 
     def __init__(self, config_file: str):
+        self.running = True
+
         with open(config_file) as file:
             # Load the json configuration file
             json_config = json.load(file)
 
-            # Create the different IPC message queues we will be using
-            self.client_mq = self.get_ipc_queue(json_config["server"]["ipc_key_client"])
-            self.house_mq = self.get_ipc_queue(json_config["server"]["ipc_key_house"])
-
-            # Create a barrier for synchronization
-            # 4 processes need to be synchronized : Weather, City, Market and Server Sync
-            # If the server_utils if configured as "auto", it runs on regular interval.
-            # If it's not, run when requested by the client
-            compute_barrier = Barrier(parties=4)
-
-            # This other barrier is used to update shared memory used for the next iteration
-            # of the simulation
-            write_barrier = Barrier(parties=4)
+            # Houses running on other machines, which report through the gateway
+            # They use the pids following the ones of the local houses
+            nb_houses = json_config["cities"]["nb_houses"]
+            houses_per_process = json_config["cities"]["houses_per_process"]
+            if houses_per_process < 1:
+                raise ValueError("A home process must play at least one house")
+            remote_houses = range(
+                nb_houses + 1, nb_houses + json_config["cities"]["remote_houses"] + 1
+            )
+            if remote_houses and not json_config["gateway"]["enabled"]:
+                raise ValueError(
+                    f"{len(remote_houses)} remote houses are declared, "
+                    "they can only report through the gateway : enable it"
+                )
+
+            table = Server.load_houses(json_config["cities"], len(remote_houses))
+            weather_trace, house_trace = Server.load_traces(
+                json_config["trace"], nb_houses
+            )
 
-            # Shared memory for the weather
-            weather_shared = Array("i", 2)
-            with weather_shared.get_lock():
-                weather_shared[0] = json_config["weather"]["temperature"]
-                weather_shared[1] = json_config["weather"]["cloud_coverage"]
+            # Scenarios and length of the what-if branches
+            self.fork_config = json_config["fork"]
 
-            # Shared memory for the energy price
-            price_shared = Value("d")
-            with price_shared.get_lock():
-                price_shared.value = json_config["market"]["initial_price"]
+            # Turns end at fixed deadlines, every time_interval seconds
+            scheduler = Scheduler(
+                interval=json_config["server"]["time_interval"],
+                policy=json_config["server"]["overrun_policy"],
+                shed_logging=json_config["server"]["shed_logging"],
+            )
 
-            self.shared_variables = SharedVariables(
-                compute_barrier=compute_barrier,
-                write_barrier=write_barrier,
-                price_shared=price_shared,
-                weather_shared=weather_shared,
+            # Cores and nice levels of the processes, applied once they are started
+            self.placement = None
+            if json_config["placement"]["enabled"]:
+                self.placement = Placement(
+                    market_cores=json_config["placement"]["market_cores"],
+                    server_cores=json_config["placement"]["server_cores"],
+                    spread=json_config["placement"]["spread"],
+                    nice=json_config["placement"]["nice"],
+                )
+
+            # Stops every process at once, and removes the IPC objects
+            self.shutdown = Shutdown(json_config["server"]["shutdown_timeout"])
+
+            # Create the IPC message queue used by the client,
+            # and the transport between the houses and the market
+            self.client_mq = SysVTransport(
+                json_config["server"]["ipc_key_client"], create=True
+            )
+            self.house_transport = get_transport(
+                backend=json_config["server"]["transport"],
+                ipc_key=json_config["server"]["ipc_key_house"],
+                nb_houses=nb_houses + len(remote_houses),
+                ring_capacity=json_config["server"]["ring_capacity"],
+                groups=City.groups(nb_houses, houses_per_process),
+            )
+            self.shutdown.register(self.house_transport)
+
+            # In soak mode, home processes take the first slots of the monitor and
+            # the city, weather, market and sync processes the 4 following ones
+            self.soak = json_config["soak"]
+            self.soak_failed = False
+            monitor = None
+            if self.soak["enabled"]:
+                monitor = SoakMonitor(
+                    nb_slots=len(City.groups(nb_houses, houses_per_process)) + 4,
+                    report_every=self.soak["report_every"],
+                    memory_budget=self.soak["memory_budget"] * 1024,
+                )
+
+            # The first weather is replayed from the trace, if any
+            self.shared_variables = Server.share(
+                json_config,
+                scheduler,
+                list(weather_trace.read(0)) if weather_trace else None,
+                monitor,
             )
 
             # Declaring the simulation processes
             self.city = City(
                 shared_variables=self.shared_variables,
-                ipc_key_houses=json_config["server"]["ipc_key_house"],
-                nb_houses=json_config["cities"]["nb_houses"],
-                average_conso=json_config["cities"]["average_conso"],
-                max_prod=json_config["cities"]["max_prod"],
+                transport=self.house_transport,
+                table=table,
+                trace=house_trace,
+                houses_per_process=houses_per_process,
+            )
+
+            # Streaming statistics of the whole run, dumped at shutdown
+            self.analytics_dump = json_config["analytics"]["dump"]
+            self.analytics = Analytics(
+                window=json_config["analytics"]["window"],
+                weight=json_config["analytics"]["ewma_weight"],
+                accuracy=json_config["analytics"]["accuracy"],
+                min_value=json_config["analytics"]["min_value"],
+                max_value=json_config["analytics"]["max_value"],
             )
 
-            self.market = Market(
+            self.market = MARKET_ENGINES[json_config["market"]["engine"]](
                 shared_variables=self.shared_variables,
                 politics=json_config["market"]["political_score"],
                 economy=json_config["market"]["economy_score"],
-                nb_houses=json_config["cities"]["nb_houses"],
-                ipc_house=json_config["server"]["ipc_key_house"],
+                table=table,
+                transport=self.house_transport,
                 time_interval=json_config["server"]["time_interval"],
+                top_k=json_config["market"]["top_k"],
+                analytics=self.analytics,
             )
 
             self.weather = Weather(
                 shared_variables=self.shared_variables,
+                trace=weather_trace,
             )
 
             self.sync = ServerSync(
                 shared_variables=self.shared_variables,
-                time_interval=json_config["server"]["time_interval"],
             )
 
-        # Starting all processes
+            # TCP gateway for clients and houses on other machines
+            self.gateway = None
+            if json_config["gateway"]["enabled"]:
+                self.gateway = Gateway(
+                    host=json_config["gateway"]["host"],
+                    port=json_config["gateway"]["port"],
+                    handler=self.answer,
+                    transport=self.house_transport,
+                    shared_variables=self.shared_variables,
+                    table=table,
+                    remote_houses=remote_houses,
+                    house_timeout=json_config["gateway"]["house_timeout"],
+                )
+
+        self.start()
+
+    @staticmethod
+    def load_houses(cities: dict, nb_remote_houses: int) -> HouseTable:
+        """
+        Loads the parameters of the local houses from a file, or draws them at random
+        :param cities: the "cities" section of the configuration
+        :param nb_remote_houses: number of houses running on other machines,
+                                 whose rows follow the ones of the local houses
+        :return: the table of the houses
+        """
+        if not cities["houses_file"]:
+            return HouseTable.generate(
+                cities["nb_houses"],
+                cities["average_conso"],
+                cities["max_prod"],
+                nb_remote_houses,
+            )
+
+        table = HouseTable.load(
+            cities["houses_file"], cities["average_conso"], nb_remote_houses
+        )
+        if table.local_houses != cities["nb_houses"]:
+            raise ValueError(
+                f"The houses file has {table.local_houses} houses, "
+                f"{cities['nb_houses']} are simulated"
+            )
+        return table
+
+    @staticmethod
+    def load_traces(trace: dict, nb_houses: int) -> (Trace, Trace):
+        """
+        Weather and house consumption can be replayed from trace files
+        :param trace: the "trace" section of the configuration
+        :param nb_houses: number of local houses
+        :return: the weather and house traces, None if they are disabled
+        """
+        if not trace["enabled"]:
+            return None, None
+
+        weather_trace = Trace(trace["weather"], WEATHER_RECORD, trace["prefetch"])
+        house_trace = Trace(trace["houses"], HOUSE_RECORD, trace["prefetch"])
+        if house_trace.records_per_turn != nb_houses:
+            raise ValueError(
+                f"The house trace has {house_trace.records_per_turn} houses, "
+                f"{nb_houses} are simulated"
+            )
+        return weather_trace, house_trace
+
+    @staticmethod
+    def share(
+        json_config: dict,
+        scheduler: Scheduler,
+        initial_weather: list = None,
+        monitor: SoakMonitor = None,
+    ) -> SharedVariables:
+        """
+        Creates the barriers and the shared memory of the simulation
+        :param json_config: the configuration
+        :param scheduler: the schedule of the turns
+        :param initial_weather: temperature and cloud coverage of the first turn,
+                                from the configuration if None
+        :param monitor: the soak monitor, if enabled
+        :return: the shared variables
+        """
+        # Create a barrier for synchronization
+        # 4 processes need to be synchronized : Weather, City, Market and Server Sync
+        # If the server_utils if configured as "auto", it runs on regular interval.
+        # If it's not, run when requested by the client
+        # The last barrier of a turn holds the simulation when the server asks for it
+        pipelined = json_config["server"]["pipelined"]
+        compute_barrier = Barrier(
+            parties=4, action=scheduler.checkpoint if pipelined else None
+        )
+
+        # This other barrier is used to update shared memory used for the next iteration
+        # of the simulation
+        write_barrier = Barrier(
+            parties=4, action=None if pipelined else scheduler.checkpoint
+        )
+
+        initial_weather = initial_weather or [
+            json_config["weather"]["temperature"],
+            json_config["weather"]["cloud_coverage"],
+        ]
+
+        return SharedVariables(
+            compute_barrier=compute_barrier,
+            write_barrier=write_barrier,
+            # Shared memory for the weather and the energy price, with two buffers
+            # so that the next turn can be written while the current one is read
+            price_shared=Array("d", [json_config["market"]["initial_price"]] * 2),
+            weather_shared=Array("i", initial_weather * 2),
+            # Shared memory for the current turn and the history of the previous ones
+            turn_shared=Value("i"),
+            history_shared=Array("d", HISTORY_SIZE * HISTORY_FIELDS),
+            pipelined=pipelined,
+            monitor=monitor,
+            scheduler=scheduler,
+        )
+
+    def start(self) -> None:
+        """
+        Starts all the processes, then the gateway
+        """
+        self.server_processes = [self.city, self.weather, self.market, self.sync]
+        for slot, process in enumerate(self.server_processes, len(self.city.homes)):
+            process.monitor_slot = slot
+
         self.city.start()
         self.weather.start()
         self.market.start()
         self.sync.start()
 
+        # Place the processes before the gateway thread is created, so that it
+        # inherits the cores of the server
+        if self.placement:
+            self.placement.apply(
+                [
+                    ("server", "server", 0),
+                    ("server", "sync", self.sync.pid),
+                    ("market", "market", self.market.pid),
+                    ("workers", "city", self.city.pid),
+                    ("workers", "weather", self.weather.pid),
+                    ("workers", "politics", self.market.politics_process.pid),
+                    ("workers", "economics", self.market.economics_process.pid),
+                ]
+                + [("houses", home.name, home.pid) for home in self.city.homes]
+            )
+
+        if self.gateway:
+            self.gateway.start()
+
+        # Houses and external factors have been started along with the city and the market
+        self.shutdown.adopt(self.city.homes, signal.SIGKILL)
+        self.shutdown.adopt(
+            [child for child in active_children() if child not in self.city.homes]
+        )
+
         signal.signal(signal.SIGINT, self.signal_handler)
+        signal.signal(signal.SIGTERM, self.signal_handler)
+        atexit.register(
+            self.stop
+        )  # Don't leave processes and queues behind after a crash
 
         print(f"{Fore.GREEN}Initialization complete{Style.RESET_ALL}")
 
     def signal_handler(self, _, _2):
         """
         Intercept the stop signal and shut down properly
+        No client is waiting for an answer, so its message queue is removed as well
         """
         self.stop()
+        self.client_mq.remove()
         sys.exit(1)
 
     def receive(self) -> str:
@@ -113,106 +345,373 @@ class Server:
         """
         sleep(0.1)
         try:
-            message = self.client_mq.receive(type=1, block=False)
-        except sysv_ipc.BusyError:
+            message = self.client_mq.receive(1, block=False)
+        except TransportBusy:
             message = None
 
         return message
 
     def process(self, message: str) -> bool:
         """
-        Processes the message
+        Processes the message and sends back the response to the client
         :param message: a string
         :return: True if continue, False otherwise
         """
         if not message:
-            return True  # Continue
+            return self.running  # Continue, unless stopped through the gateway
 
         print(f"{Fore.LIGHTMAGENTA_EX}Received a message from client{Style.RESET_ALL}")
-        message = message[0].decode()
+        response = self.answer(message[0].decode())
+        self.client_mq.send(response.encode(), 2)
 
-        if message == "end":
-            return self.stop()
-        if message == "report":
-            return self.send_report()
+        return self.running
+
+    def answer(self, request: str) -> str:
+        """
+        Builds the response to a client request, received through
+        the IPC message queue or the gateway
+        :param request: "report", "history", "stats", "types", "top", "energy",
+                        "analytics", "fork <number of branches>" or "end"
+        :return: the response
+        """
+        requests = {
+            "end": self.stop,
+            "report": self.report,
+            "history": self.history,
+            "stats": self.stats,
+            "types": self.types,
+            "top": self.top,
+            "energy": self.energy,
+            "analytics": self.streaming_statistics,
+        }
+        if request in requests:
+            return requests[request]()
+        if request.startswith("fork ") and request[5:].isdigit():
+            return self.fork(int(request[5:]))
 
         return self.error()
 
-    def send_report(self) -> bool:
+    def report(self) -> str:
         """
-        Sends back a report to the client
+        Current state of the simulation
+        :return: "price;temp;coverage"
         """
-        message = []
+        with self.shared_variables.turn_shared.get_lock():
+            turn = self.shared_variables.turn_shared.value
 
-        with self.shared_variables.price_shared.get_lock():
-            message.append("{:.2f}".format(self.shared_variables.price_shared.value))
+        message = ["{:.2f}".format(self.shared_variables.get_price(turn))]
+        message.extend(map(str, self.shared_variables.get_weather(turn)))
 
-        with self.shared_variables.weather_shared.get_lock():
-            message.extend(map(str, self.shared_variables.weather_shared))
+        print(f"{Fore.LIGHTMAGENTA_EX}Send report to client{Style.RESET_ALL}")
 
-        message_sent = ";".join(message).encode()
-        self.client_mq.send(message_sent, type=2)
+        return ";".join(message)
 
-        print(f"{Fore.LIGHTMAGENTA_EX}Send report to client{Style.RESET_ALL}")
+    def history(self) -> str:
+        """
+        State of the simulation at the beginning of the last turns
+        :return: "turn,price,temp,coverage;..." from the oldest to the newest turn
+        """
+        with self.shared_variables.turn_shared.get_lock():
+            turn = self.shared_variables.turn_shared.value
+
+        with self.shared_variables.history_shared.get_lock():
+            history = self.shared_variables.history_shared[:]
+
+        entries = []
+        for past_turn in range(max(0, turn - HISTORY_SIZE + 1), turn + 1):
+            position = (past_turn % HISTORY_SIZE) * HISTORY_FIELDS
+            _, price, temperature, cloud_coverage = history[
+                position : position + HISTORY_FIELDS
+            ]
+            entries.append(
+                f"{past_turn},{'{:.2f}'.format(price)},"
+                f"{int(temperature)},{int(cloud_coverage)}"
+            )
+
+        print(f"{Fore.LIGHTMAGENTA_EX}Send history to client{Style.RESET_ALL}")
+
+        return ";".join(entries)
+
+    def stats(self) -> str:
+        """
+        Metrics of the house transport and of the turn schedule
+        :return: "turn;backend;capacity;pending;high_water;blocked_sends;blocked_time;
+                 overruns;lateness;max_lateness"
+        """
+        with self.shared_variables.turn_shared.get_lock():
+            turn = self.shared_variables.turn_shared.value
+
+        stats = self.house_transport.stats()
+        overruns, lateness, max_lateness = self.shared_variables.scheduler.overruns()
+
+        print(f"{Fore.LIGHTMAGENTA_EX}Send stats to client{Style.RESET_ALL}")
+
+        return ";".join(
+            map(
+                str,
+                [
+                    turn,
+                    stats["backend"],
+                    stats["capacity"],
+                    stats["pending"],
+                    stats["high_water"],
+                    stats["blocked_sends"],
+                    "{:.3f}".format(stats["blocked_time"]),
+                    overruns,
+                    "{:.3f}".format(lateness),
+                    "{:.3f}".format(max_lateness),
+                ],
+            )
+        )
+
+    def types(self) -> str:
+        """
+        Consumption and bills of each behaviour type during the last settled turn
+        :return: "turn;type,houses,consumption,mean consumption,bills,mean bill;..."
+        """
+        turn, types = self.market.aggregates.by_type()
+
+        entries = [str(turn)]
+        for behaviour, (count, consumption, bills) in types.items():
+            entries.append(
+                ",".join(
+                    [
+                        TYPES[behaviour],
+                        str(count),
+                        "{:.2f}".format(consumption),
+                        "{:.2f}".format(consumption / count if count else 0),
+                        "{:.2f}".format(bills),
+                        "{:.2f}".format(bills / count if count else 0),
+                    ]
+                )
+            )
+
+        print(f"{Fore.LIGHTMAGENTA_EX}Send types to client{Style.RESET_ALL}")
 
-        return True
+        return ";".join(entries)
 
-    def error(self) -> bool:
+    def top(self) -> str:
+        """
+        Biggest consumers and producers of the last settled turn
+        :return: "turn;house,kWh,house,kWh...;house,kWh,house,kWh..."
+        """
+        turn, consumers, producers = self.market.aggregates.ranking()
+
+        entries = [str(turn)]
+        for ranking in (consumers, producers):
+            entries.append(
+                ",".join(
+                    f"{house},{'{:.2f}'.format(energy)}" for house, energy in ranking
+                )
+            )
+
+        print(f"{Fore.LIGHTMAGENTA_EX}Send top houses to client{Style.RESET_ALL}")
+
+        return ";".join(entries)
+
+    def energy(self) -> str:
+        """
+        Energy exchanged between the houses during the last settled turn
+        :return: "turn;given;sold"
+        """
+        turn, given, sold = self.market.aggregates.energy()
+
+        print(f"{Fore.LIGHTMAGENTA_EX}Send energy to client{Style.RESET_ALL}")
+
+        return f"{turn};{'{:.2f}'.format(given)};{'{:.2f}'.format(sold)}"
+
+    def streaming_statistics(self) -> str:
+        """
+        Streaming statistics of the run
+        :return: "name,count,ewma,ew_std,mean,std;..." for the price and consumption series,
+                 then "name,count,p50,p90,p99;..." for the bills and consumption sketches
+        """
+        entries = []
+        for name, series in self.analytics.series.items():
+            summary = series.summary()
+            entries.append(
+                ",".join(
+                    [name, str(summary["count"])]
+                    + [
+                        "{:.4f}".format(summary[field])
+                        for field in ("ewma", "ew_std", "mean", "std")
+                    ]
+                )
+            )
+        for name, sketch in self.analytics.sketches.items():
+            count, values = sketch.quantiles(QUANTILES)
+            entries.append(
+                ",".join(
+                    [name, str(count)] + ["{:.2f}".format(value) for value in values]
+                )
+            )
+
+        print(f"{Fore.LIGHTMAGENTA_EX}Send analytics to client{Style.RESET_ALL}")
+
+        return ";".join(entries)
+
+    def fork(self, nb_branches: int) -> str:
+        """
+        Holds the simulation at the end of the current turn, forks it into branches
+        playing the scenarios of the configuration, then resumes it.
+        The branches run while the simulation goes on, and their results are gathered
+        :param nb_branches: number of branches, taking the scenarios in turn
+        :return: "turn;name,last turn,price,mean price,consumption,bills,politics,economy;..."
+        """
+        scenarios = self.fork_config["scenarios"]
+        if not scenarios or not 0 < nb_branches <= self.fork_config["max_branches"]:
+            return self.error()
+
+        print(f"{Fore.LIGHTMAGENTA_EX}Forking {nb_branches} branches{Style.RESET_ALL}")
+
+        if not self.shared_variables.scheduler.hold(self.fork_config["hold_timeout"]):
+            print(
+                f"{Fore.LIGHTMAGENTA_EX}The turn didn't end within "
+                f"{self.fork_config['hold_timeout']}s, no branch forked{Style.RESET_ALL}"
+            )
+            return self.error()
+        try:
+            # Shared memory is read before forking, the simulation writes it once resumed
+            with self.shared_variables.turn_shared.get_lock():
+                turn = self.shared_variables.turn_shared.value
+            state = {
+                "turn": turn + 1,
+                "price": self.shared_variables.get_price(turn + 1),
+                "weather": self.shared_variables.get_weather(turn + 1),
+                "politics": self.market.politics.value,
+                "economy": self.market.economy.value,
+                "consumption": self.market.daily_consumption.value,
+                "productions": self.city.table.productions[: self.city.nb_houses],
+                "seed": getrandbits(32),
+            }
+
+            children = [
+                Branch.fork(
+                    {
+                        "scenario": scenarios[index % len(scenarios)],
+                        "state": state,
+                        "market": self.market,
+                        "weather": self.weather,
+                        "table": self.city.table,
+                        "trace": self.city.trace,
+                    },
+                    self.fork_config["turns"],
+                )
+                for index in range(nb_branches)
+            ]
+        finally:
+            self.shared_variables.scheduler.release()
+
+        entries = [str(turn + 1)]
+        for results in Branch.gather(children):
+            if results is None:
+                entries.append("failed,0,0,0,0,0,0,0")
+                continue
+            entries.append(
+                ",".join(
+                    [
+                        results["name"],
+                        str(results["turn"]),
+                        "{:.4f}".format(results["price"]),
+                        "{:.4f}".format(results["mean_price"]),
+                        "{:.2f}".format(results["consumption"]),
+                        "{:.2f}".format(results["bills"]),
+                        str(results["politics"]),
+                        str(results["economy"]),
+                    ]
+                )
+            )
+
+        print(f"{Fore.LIGHTMAGENTA_EX}Send branches to client{Style.RESET_ALL}")
+
+        return ";".join(entries)
+
+    def error(self) -> str:
         """
         Error handling, when the server_utils doesn't recognizes the request
-        :return: 1
+        :return: "error"
         """
         print(f"{Fore.LIGHTMAGENTA_EX}Couldn't parse client request{Style.RESET_ALL}")
-        self.client_mq.send("error".encode(), type=2)
-        return True
+        return "error"
+
+    def check_soak(self) -> None:
+        """
+        In soak mode, stops the simulation with a failure if a process grew over
+        the memory budget, or with a success once the number of turns is reached
+        """
+        monitor = self.shared_variables.monitor
+        if not monitor or not self.running:
+            return
+
+        for slot in monitor.over_budget():
+            print(
+                f"{Fore.RED}Soak test failed : {self.monitor_label(slot)} grew by "
+                f"{monitor.growth(slot) // 1024} kB at turn {monitor.turn(slot)}, "
+                f"over the budget of {self.soak['memory_budget']} kB{Style.RESET_ALL}"
+            )
+            self.soak_failed = True
+
+        with self.shared_variables.turn_shared.get_lock():
+            turn = self.shared_variables.turn_shared.value
+
+        if self.soak_failed:
+            self.stop()
+        elif self.soak["turns"] and turn >= self.soak["turns"]:
+            print(
+                f"{Fore.GREEN}Soak test passed : {turn} turns within the memory budget"
+                f"{Style.RESET_ALL}"
+            )
+            self.stop()
 
-    def stop(self) -> bool:
+    def monitor_label(self, slot: int) -> str:
+        """
+        :param slot: a slot of the soak monitor
+        :return: the name of the process using it
+        """
+        if slot < len(self.city.homes):
+            return self.city.homes[slot].name
+        return self.server_processes[slot - len(self.city.homes)].name
+
+    def stop(self) -> str:
         """
         Terminates the server_utils process
         Deletes message queue, and ends processes
+        :return: "end", the termination code sent to the client
         """
+        if not self.running:
+            return "end"
+        self.running = False
 
         print(
             f"\n{Back.RED}{Fore.WHITE}***** Begin server_utils "
             f"stop process *****{Style.RESET_ALL}"
         )
 
-        # Killing all processes
-        self.sync.kill()
-        self.market.kill()
-        self.weather.kill()
-        for home in self.city.homes:
-            home.kill()
-        self.city.kill()
-
-        self.house_mq.remove()
-
-        print(f"{Fore.LIGHTRED_EX}All processes stopped{Style.RESET_ALL}")
-
-        # Send a zero (termination) code to the client
-        message = "end".encode()
-        self.client_mq.send(message=message, type=2)
-
-        return False  # Continue
-
-    @staticmethod
-    def get_ipc_queue(ipc_key: int) -> sysv_ipc.MessageQueue:
-        """
-        Create an IPC message queue given an ID.
-        If it already exists, remove it using the os primitive and create if again
-        :param ipc_key: the IPC Message Queue key id
-        :return: the MessageQueue Object
-        """
         try:
-            message_queue = sysv_ipc.MessageQueue(ipc_key, sysv_ipc.IPC_CREX)
-        except sysv_ipc.ExistentialError:
+            # Dump the statistics while the market still holds consistent ones
+            if self.analytics_dump:
+                try:
+                    with open(self.analytics_dump, "w") as dump:
+                        json.dump(self.analytics.dump(), dump)
+                    print(
+                        f"{Fore.CYAN}Analytics dumped to "
+                        f"{self.analytics_dump}{Style.RESET_ALL}"
+                    )
+                except OSError as error:
+                    print(
+                        f"{Fore.RED}Couldn't dump the analytics to "
+                        f"{self.analytics_dump} : {error}{Style.RESET_ALL}"
+                    )
+        finally:
+            # Killing all processes and removing the IPC objects, whatever happened
+            teardown = self.shutdown.stop()
+
             print(
-                f"{Fore.BLUE}Message queue {ipc_key} already exists, recreating it.{Style.RESET_ALL}"
+                f"{Fore.LIGHTRED_EX}All processes stopped in "
+                f"{'{:.0f}'.format(teardown * 1000)} ms{Style.RESET_ALL}"
             )
-            sysv_ipc.MessageQueue(ipc_key).remove()
-            message_queue = sysv_ipc.MessageQueue(ipc_key, sysv_ipc.IPC_CREX)
 
-        return message_queue
+        return "end"
 
 
 # Main server_utils program loop
@@ -227,7 +726,7 @@ if __name__ == "__main__":
 
     # When server is set up, listen for messages from the client
     while response := server.process(server.receive()):
-        pass
+        server.check_soak()
 
     print(f"{Fore.LIGHTMAGENTA_EX}Stopping server_utils, bye :){Style.RESET_ALL}")
-    sys.exit(0)
+    sys.exit(1 if server.soak_failed else 0)
@@ -0,0 +1,165 @@
+"""
+Statistics of the house population, maintained by the market
+as it settles the transactions of a turn
+"""
+import heapq
+import multiprocessing
+from multiprocessing import Array
+
+from .home import TYPES
+
+# Published turn, energy given away and energy sold to the market
+HEADER_FIELDS = 3
+
+# Per behaviour type : number of houses, total consumption and total bills
+TYPE_FIELDS = 3
+
+
+class Aggregates:
+    """
+    Aggregates of a turn, updated transaction by transaction in the market process :
+    totals per behaviour type, the top_k biggest consumers and producers
+    kept in bounded heaps, and the energy given away versus sold.
+    They are published in shared memory once the turn is settled,
+    so the server reads the last turn in O(top_k) while the next one runs
+    """
+
+    def __init__(self, top_k: int):
+        self.top_k = top_k  # Number of consumers and producers ranked
+
+        # Published aggregates : header, types, then (energy, house) pairs
+        # of the consumers and the producers, from the biggest to the smallest
+        self.consumers_position = HEADER_FIELDS + len(TYPES) * TYPE_FIELDS
+        self.producers_position = self.consumers_position + 2 * top_k
+        self.shared = Array("d", self.producers_position + 2 * top_k)
+        self.shared[0] = -1  # No turn published yet
+
+        # Aggregates of the turn being settled, private to the market process
+        self.lock = multiprocessing.Lock()  # Transactions run concurrently
+        self.types = {}
+        self.consumers = []  # Min-heaps of (energy, house)
+        self.producers = []
+        self.given = 0
+        self.sold = 0
+        self.reset()
+
+    def reset(self) -> None:
+        """
+        Starts the aggregates of a new turn
+        """
+        self.types = {behaviour: [0, 0.0, 0.0] for behaviour in TYPES}
+        self.consumers = []
+        self.producers = []
+        self.given = 0
+        self.sold = 0
+
+    def add_report(self, house: int, behaviour: int, consumption: float) -> None:
+        """
+        :param house: the pid of the house
+        :param behaviour: its type
+        :param consumption: its consumption minus its production
+        """
+        if behaviour not in TYPES:
+            return  # Remote house which never connected, stood in by the gateway
+
+        with self.lock:
+            entry = self.types[behaviour]
+            entry[0] += 1
+            entry[1] += consumption
+
+            # Only keep the top_k biggest ones, the smallest of which is on top
+            heap = self.consumers if consumption > 0 else self.producers
+            if len(heap) < self.top_k:
+                heapq.heappush(heap, (abs(consumption), house))
+            elif heap and abs(consumption) > heap[0][0]:
+                heapq.heapreplace(heap, (abs(consumption), house))
+
+    def add_bill(self, behaviour: int, bill: float) -> None:
+        """
+        :param behaviour: the type of the billed house
+        :param bill: the amount of the bill, negative if the house is paid
+        """
+        if behaviour not in TYPES:
+            return
+
+        with self.lock:
+            self.types[behaviour][2] += bill
+
+    def add_given(self, energy: float) -> None:
+        """
+        :param energy: energy given away by a house, in kWh
+        """
+        with self.lock:
+            self.given += energy
+
+    def add_sold(self, energy: float) -> None:
+        """
+        :param energy: energy sold to the market by a house, in kWh
+        """
+        with self.lock:
+            self.sold += energy
+
+    def publish(self, turn: int) -> None:
+        """
+        Makes the aggregates of a settled turn readable by the server,
+        then starts the ones of the next turn
+        :param turn: the settled turn
+        """
+        values = [turn, self.given, self.sold]
+        for behaviour in TYPES:
+            values.extend(self.types[behaviour])
+        for heap in (self.consumers, self.producers):
+            ranking = sorted(heap, reverse=True)
+            ranking.extend([(0, 0)] * (self.top_k - len(ranking)))
+            for energy, house in ranking:
+                values.extend((energy, house))
+
+        with self.shared.get_lock():
+            self.shared[:] = values
+
+        self.reset()
+
+    def energy(self) -> (int, float, float):
+        """
+        :return: the last published turn, the energy given away and sold during it
+        """
+        with self.shared.get_lock():
+            turn, given, sold = self.shared[:HEADER_FIELDS]
+        return int(turn), given, sold
+
+    def by_type(self) -> (int, dict):
+        """
+        :return: the last published turn, and for each behaviour type
+                 the number of houses, total consumption and total bills
+        """
+        with self.shared.get_lock():
+            turn = self.shared[0]
+            values = self.shared[HEADER_FIELDS : self.consumers_position]
+
+        types = {}
+        for index, behaviour in enumerate(TYPES):
+            count, consumption, bills = values[
+                index * TYPE_FIELDS : (index + 1) * TYPE_FIELDS
+            ]
+            types[behaviour] = (int(count), consumption, bills)
+        return int(turn), types
+
+    def ranking(self) -> (int, list, list):
+        """
+        :return: the last published turn, and the (house, energy) pairs
+                 of its biggest consumers and producers
+        """
+        with self.shared.get_lock():
+            turn = self.shared[0]
+            values = self.shared[self.consumers_position :]
+
+        rankings = []
+        for start in (0, 2 * self.top_k):
+            rankings.append(
+                [
+                    (int(values[index + 1]), values[index])
+                    for index in range(start, start + 2 * self.top_k, 2)
+                    if values[index + 1]  # Empty slots have no house
+                ]
+            )
+        return int(turn), rankings[0], rankings[1]
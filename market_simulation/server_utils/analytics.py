@@ -0,0 +1,283 @@
+"""
+Streaming statistics of the market, kept in constant memory
+however many turns and houses are simulated
+"""
+import math
+from multiprocessing import Array, Lock
+
+# Fields of a series : number of values, EWMA, EW variance,
+# rolling mean, rolling sum of squared deviations, next position in the window
+SERIES_FIELDS = 6
+
+# Quantiles reported for the sketches
+QUANTILES = (0.5, 0.9, 0.99)
+
+
+class Series:
+    """
+    Statistics of a value recorded once per turn : exponentially weighted
+    mean and variance, and mean and variance over the last window values,
+    updated in O(1) with Welford's method
+    """
+
+    def __init__(self, window: int, weight: float):
+        self.window = window  # Number of turns of the rolling window
+        self.weight = weight  # Weight of the newest value in the EWMA
+        self.shared = Array("d", SERIES_FIELDS + window)
+
+    def add(self, value: float) -> None:
+        """
+        :param value: the value of the turn
+        """
+        with self.shared.get_lock():
+            count, ewma, ewvar, mean, squares, position = self.shared[:SERIES_FIELDS]
+            position = int(position)
+
+            if count:
+                delta = value - ewma
+                ewma += self.weight * delta
+                ewvar = (1 - self.weight) * (ewvar + self.weight * delta ** 2)
+            else:
+                ewma = value
+
+            if count < self.window:  # Add the value to the window
+                delta = value - mean
+                mean += delta / (count + 1)
+                squares += delta * (value - mean)
+            else:  # Replace the oldest value of the window
+                oldest = self.shared[SERIES_FIELDS + position]
+                previous_mean = mean
+                mean += (value - oldest) / self.window
+                squares += (value - oldest) * (value - mean + oldest - previous_mean)
+
+            self.shared[SERIES_FIELDS + position] = value
+            self.shared[:SERIES_FIELDS] = [
+                count + 1,
+                ewma,
+                ewvar,
+                mean,
+                max(0.0, squares),
+                (position + 1) % self.window,
+            ]
+
+    def summary(self) -> dict:
+        """
+        :return: the EWMA and rolling mean, with their standard deviations
+        """
+        with self.shared.get_lock():
+            count, ewma, ewvar, mean, squares, _ = self.shared[:SERIES_FIELDS]
+
+        size = min(count, self.window)
+        return {
+            "count": int(count),
+            "ewma": ewma,
+            "ew_std": math.sqrt(ewvar),
+            "mean": mean,
+            "std": math.sqrt(squares / (size - 1)) if size > 1 else 0.0,
+        }
+
+
+class Sketch:
+    """
+    Quantile sketch with a bounded relative error : values are counted in buckets
+    whose bounds grow geometrically, the positive and negative values separately,
+    the ones too small to be told apart from zero in a zero bucket.
+    The buckets are fixed by the parameters, so sketches built with the same ones
+    merge by adding their counts, across shards or runs
+    """
+
+    def __init__(self, accuracy: float, min_value: float, max_value: float):
+        self.accuracy = accuracy  # Relative error of the quantiles
+        self.min_value = min_value  # Smallest magnitude told apart from zero
+        self.max_value = max_value  # Larger magnitudes are counted as this one
+        self.gamma = (1 + accuracy) / (1 - accuracy)
+        self.offset = math.ceil(math.log(min_value, self.gamma))
+        self.nb_buckets = math.ceil(math.log(max_value, self.gamma)) - self.offset + 1
+
+        # Zero bucket, then the positive and the negative buckets
+        self.shared = Array("d", 1 + 2 * self.nb_buckets)
+
+    def bucket(self, value: float) -> int:
+        """
+        :param value: a value
+        :return: the position of its bucket in the shared array
+        """
+        magnitude = abs(value)
+        if magnitude < self.min_value:
+            return 0
+
+        index = math.ceil(math.log(min(magnitude, self.max_value), self.gamma))
+        index = min(max(index - self.offset, 0), self.nb_buckets - 1)
+        return 1 + index + (self.nb_buckets if value < 0 else 0)
+
+    def value(self, position: int) -> float:
+        """
+        :param position: the position of a bucket in the shared array
+        :return: the value representing the bucket, within the relative error
+        """
+        if position == 0:
+            return 0.0
+
+        index = (position - 1) % self.nb_buckets + self.offset
+        value = 2 * self.gamma ** index / (self.gamma + 1)
+        return -value if position > self.nb_buckets else value
+
+    def add(self, value: float) -> None:
+        """
+        :param value: the value to count
+        """
+        position = self.bucket(value)
+        with self.shared.get_lock():
+            self.shared[position] += 1
+
+    def compatible(self, other) -> bool:
+        """
+        :param other: another Sketch
+        :return: True if both count the values in the same buckets
+        """
+        return (self.gamma, self.offset, self.nb_buckets) == (
+            other.gamma,
+            other.offset,
+            other.nb_buckets,
+        )
+
+    def merge(self, counts: list) -> None:
+        """
+        Adds the counts of another sketch with the same parameters
+        :param counts: its bucket counts
+        """
+        if len(counts) != len(self.shared):
+            raise ValueError("Only sketches with the same parameters can be merged")
+        with self.shared.get_lock():
+            for position, count in enumerate(counts):
+                self.shared[position] += count
+
+    def quantiles(self, quantiles: tuple = QUANTILES) -> (int, list):
+        """
+        :param quantiles: the quantiles to compute, between 0 and 1
+        :return: the number of values counted, and the value of each quantile,
+                 NaN if no value was counted
+        """
+        with self.shared.get_lock():
+            counts = self.shared[:]
+
+        total = sum(counts)
+        if not total:
+            return 0, [math.nan] * len(quantiles)
+
+        # From the most negative value to the most positive one
+        order = (
+            list(range(2 * self.nb_buckets, self.nb_buckets, -1))
+            + [0]
+            + list(range(1, self.nb_buckets + 1))
+        )
+        values = []
+        for quantile in quantiles:
+            rank = quantile * (total - 1)
+            seen = 0
+            for position in order:
+                seen += counts[position]
+                if seen > rank:
+                    values.append(self.value(position))
+                    break
+            else:
+                values.append(0.0)
+        return int(total), values
+
+    def dump(self) -> dict:
+        """
+        :return: the parameters and the non-empty buckets of the sketch
+        """
+        with self.shared.get_lock():
+            counts = self.shared[:]
+        return {
+            "accuracy": self.accuracy,
+            "min_value": self.min_value,
+            "max_value": self.max_value,
+            "buckets": {
+                position: count for position, count in enumerate(counts) if count
+            },
+        }
+
+    @staticmethod
+    def load(dump: dict):
+        """
+        :param dump: a dump of a sketch
+        :return: the Sketch
+        """
+        sketch = Sketch(dump["accuracy"], dump["min_value"], dump["max_value"])
+        counts = [0] * len(sketch.shared)
+        for position, count in dump["buckets"].items():
+            counts[int(position)] = count
+        sketch.merge(counts)
+        return sketch
+
+
+class Analytics:
+    """
+    Streaming statistics updated by the market as it settles the transactions :
+    rolling statistics of the price and total consumption of every turn,
+    sketches of the bills and consumption of the houses.
+    They live in shared memory, read by the server
+    """
+
+    def __init__(
+        self,
+        window: int = 50,
+        weight: float = 0.1,
+        accuracy: float = 0.01,
+        min_value: float = 0.001,
+        max_value: float = 1e6,
+    ):
+        self.parameters = (window, weight, accuracy, min_value, max_value)
+        self.series = {
+            "price": Series(window, weight),
+            "consumption": Series(window, weight),
+        }
+        self.sketches = {
+            "bills": Sketch(accuracy, min_value, max_value),
+            "consumption": Sketch(accuracy, min_value, max_value),
+        }
+
+        # Total consumption of the turn being settled, private to the market process
+        self.lock = Lock()
+        self.consumption = 0
+
+    def empty_copy(self):
+        """
+        :return: new Analytics with the same parameters and no values
+        """
+        return Analytics(*self.parameters)
+
+    def add_report(self, consumption: float) -> None:
+        """
+        :param consumption: the consumption minus production reported by a house
+        """
+        self.sketches["consumption"].add(consumption)
+        with self.lock:
+            self.consumption += consumption
+
+    def add_bill(self, bill: float) -> None:
+        """
+        :param bill: the bill sent to a house
+        """
+        self.sketches["bills"].add(bill)
+
+    def end_turn(self, price: float) -> None:
+        """
+        Records the price and the total consumption of a settled turn
+        :param price: the price of a kWh during the turn
+        """
+        self.series["price"].add(price)
+        with self.lock:
+            consumption, self.consumption = self.consumption, 0
+        self.series["consumption"].add(consumption)
+
+    def dump(self) -> dict:
+        """
+        :return: the statistics of the series and the dumps of the sketches
+        """
+        return {
+            "series": {name: series.summary() for name, series in self.series.items()},
+            "sketches": {name: sketch.dump() for name, sketch in self.sketches.items()},
+        }
@@ -0,0 +1,60 @@
+"""
+Market process running its transactions in an asyncio event loop,
+instead of a thread pool created every turn
+"""
+import asyncio
+from threading import Thread
+
+from .market import Market
+
+
+class AsyncMarket(Market):
+    """
+    Market whose reports are fed to a single asyncio event loop by a reader thread.
+    Both are created once, on the first turn, and live as long as the process.
+    Transactions never wait, so each one runs to completion in the loop
+    without contending on the market locks
+    """
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+
+        # Created in the market process, on the first turn
+        self.loop = None
+        self.reports = None
+
+    def start_engine(self) -> None:
+        """
+        Creates the event loop and the reader thread forwarding the house reports to it
+        """
+        self.loop = asyncio.new_event_loop()
+        asyncio.set_event_loop(self.loop)
+        self.reports = asyncio.Queue()
+        Thread(target=self.read_reports, daemon=True).start()
+
+    def read_reports(self) -> None:
+        """
+        Blocks on the transport in the reader thread, and hands every report to the loop
+        """
+        while True:
+            report = self.transport.receive_report()
+            self.loop.call_soon_threadsafe(self.reports.put_nowait, report)
+
+    async def receive_reports(self) -> None:
+        """
+        Settles the transaction of each house as soon as its report is received
+        """
+        for _ in range(self.nb_houses):
+            message, house = await self.reports.get()
+            self.transaction(message, house)
+
+    def update(self) -> None:
+        """
+        Wait for each home to report usage
+        Do it in the event loop of the market
+        """
+        if self.loop is None:
+            self.start_engine()
+
+        self.loop.run_until_complete(self.receive_reports())
+        self.settle_waiting()
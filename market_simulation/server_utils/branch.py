@@ -0,0 +1,230 @@
+"""
+What-if branches of the simulation, forked from the server at a turn boundary
+to compare scenarios from the same starting point
+"""
+import contextlib
+import json
+import multiprocessing
+import os
+import random
+import signal
+import traceback
+from multiprocessing import Array, Barrier, Value
+
+from .aggregates import Aggregates
+from .home import Home
+from .housetable import HouseTable
+from .market import Market
+from .sharedvars import SharedVariables, HISTORY_SIZE, HISTORY_FIELDS
+from .trace import Trace
+from .transport import LoopbackTransport
+from .weather import Weather
+
+
+class Branch:
+    """
+    Branch of the simulation, playing in a single headless process the turns
+    following the state the simulation was held in. It runs in a child forked
+    from the server : the copies of the market and weather are shared
+    with the server until written, and are bound to private shared memory
+    and a loopback transport, leaving the running simulation untouched.
+    The branch plays the local houses on a private copy of the house table.
+    A scenario overrides the price coefficients (market), sets the weather,
+    or triggers the external factors at given turns of the branch (events)
+    """
+
+    def __init__(
+        self,
+        scenario: dict,
+        state: dict,
+        market: Market,
+        weather: Weather,
+        table: HouseTable,
+        trace: Trace = None,
+    ):
+        self.scenario = scenario
+        self.turn = state["turn"]
+        self.table = table.copy()
+        self.table.productions[:] = state["productions"]
+        self.trace = trace
+
+        # Every branch draws the same random numbers, only the scenarios differ
+        random.seed(state["seed"])
+
+        self.shared_variables = SharedVariables(
+            compute_barrier=Barrier(1),
+            write_barrier=Barrier(1),
+            price_shared=Array("d", [state["price"]] * 2),
+            weather_shared=Array(
+                "i", list(self.scenario_weather(*state["weather"])) * 2
+            ),
+            turn_shared=Value("i", self.turn),
+            history_shared=Array("d", HISTORY_SIZE * HISTORY_FIELDS),
+        )
+
+        # The shared memory of the copies belongs to the running simulation
+        self.market = market
+        self.market.shared_variables = self.shared_variables
+        self.market.transport = LoopbackTransport(self.table.size)
+        self.market.table = self.table
+        self.market.nb_houses = self.table.size
+        self.market.politics = Value("i", state["politics"])
+        self.market.economy = Value("i", state["economy"])
+        self.market.daily_consumption = Value("d", state["consumption"])
+        self.market.surplus = Value("d")
+        self.market.waiting_lock = multiprocessing.Lock()
+        self.market.aggregates = Aggregates(market.aggregates.top_k)
+        self.market.analytics = market.analytics.empty_copy()
+        self.market.turn = self.turn
+        for coefficient, value in scenario.get("market", {}).items():
+            setattr(self.market, coefficient, value)
+
+        self.weather = weather
+        self.weather.shared_variables = self.shared_variables
+        self.weather.turn = self.turn
+
+    def scenario_weather(self, temperature: int, cloud_coverage: int) -> (int, int):
+        """
+        :param temperature: the temperature of a turn
+        :param cloud_coverage: the cloud coverage of a turn
+        :return: the weather of the turn, with the values set by the scenario
+        """
+        weather = self.scenario.get("weather", {})
+        return (
+            weather.get("temperature", temperature),
+            weather.get("cloud_coverage", cloud_coverage),
+        )
+
+    def play(self) -> (float, float, float):
+        """
+        Plays a turn : the houses report, the market settles the bills,
+        then the price and the weather of the next turn are written
+        :return: the price of the turn, the total of the bills and of the consumption
+        """
+        consumption = 0
+        temperature, cloud_coverage = self.shared_variables.get_weather(self.turn)
+
+        for row in range(self.table.size):
+            if self.trace:
+                conso, production = self.trace.read(self.turn, row)
+            else:
+                conso = Home.get_cons(temperature)
+                production = Home.get_prod(
+                    self.table.base_productions[row],
+                    self.table.productions[row],
+                    temperature,
+                    cloud_coverage,
+                )
+            self.table.consumptions[row] = conso
+            self.table.productions[row] = production
+            consumption += conso - production
+
+            self.market.transaction(str(conso - production).encode(), row + 1)
+        self.market.settle_waiting()
+
+        for row in range(self.table.size):
+            self.market.transport.receive_bill(row + 1)
+        bills = sum(self.table.bills)
+        price = self.shared_variables.get_price(self.turn)
+
+        # The price is computed with the weather of the turn, write it first
+        self.market.write()
+        self.weather.write()
+        self.shared_variables.set_weather(
+            self.turn + 1,
+            *self.scenario_weather(*self.shared_variables.get_weather(self.turn + 1)),
+        )
+
+        self.turn += 1
+        self.market.turn = self.weather.turn = self.turn
+        return price, bills, consumption
+
+    def run(self, turns: int) -> dict:
+        """
+        :param turns: number of turns to play
+        :return: the results of the branch
+        """
+        prices = []
+        total_bills = total_consumption = 0
+        events = self.scenario.get("events", {})
+
+        for branch_turn in range(turns):
+            # External factors only deteriorate when the scenario says so
+            if branch_turn in events.get("politics", []):
+                self.market.signal_handler(signal.SIGUSR1, None)
+            if branch_turn in events.get("economics", []):
+                self.market.signal_handler(signal.SIGUSR2, None)
+
+            price, bills, consumption = self.play()
+            prices.append(price)
+            total_bills += bills
+            total_consumption += consumption
+
+        return {
+            "name": self.scenario.get("name", "branch"),
+            "turn": self.turn,
+            "price": self.shared_variables.get_price(self.turn),
+            "mean_price": sum(prices) / max(1, len(prices)),
+            "bills": total_bills,
+            "consumption": total_consumption,
+            "politics": self.market.politics.value,
+            "economy": self.market.economy.value,
+        }
+
+    @staticmethod
+    def fork(branch_arguments: dict, turns: int) -> (int, int):
+        """
+        Forks a child running a branch, which sends back its results through a pipe.
+        The server runs threads (gateway, executor) : only the calling one exists
+        in the child, and the locks the others held stay held. So the branch only
+        uses shared memory and locks created after the fork, its output goes to
+        /dev/null and its errors to the raw descriptor of stderr
+        :param branch_arguments: the arguments of the Branch
+        :param turns: number of turns to play
+        :return: the pid of the child and the pipe to read the results from
+        """
+        reader, writer = os.pipe()
+        pid = os.fork()
+        if not pid:
+            os.close(reader)
+            Branch.child(branch_arguments, turns, writer)
+
+        os.close(writer)
+        return pid, reader
+
+    @staticmethod
+    def child(branch_arguments: dict, turns: int, writer: int) -> None:
+        """
+        Runs a branch in the forked child, and exits it without returning :
+        the signal handlers and exit handlers of the server aren't run
+        :param branch_arguments: the arguments of the Branch
+        :param turns: number of turns to play
+        :param writer: the pipe to send the results to
+        """
+        signal.signal(signal.SIGINT, signal.SIG_DFL)
+        signal.signal(signal.SIGTERM, signal.SIG_DFL)
+        status = 1
+        try:
+            with open(os.devnull, "w") as devnull, contextlib.redirect_stdout(devnull):
+                results = Branch(**branch_arguments).run(turns)
+            os.write(writer, json.dumps(results).encode())
+            status = 0
+        except Exception:  # pylint: disable=broad-except
+            os.write(2, traceback.format_exc().encode())
+        finally:
+            os._exit(status)  # pylint: disable=protected-access
+
+    @staticmethod
+    def gather(children: list) -> list:
+        """
+        Waits for the branches to end
+        :param children: list of (pid, pipe) of the forked branches
+        :return: the results of every branch, None for the ones which failed
+        """
+        results = []
+        for pid, reader in children:
+            with os.fdopen(reader, "rb") as pipe:
+                data = pipe.read()
+            os.waitpid(pid, 0)
+            results.append(json.loads(data) if data else None)
+        return results
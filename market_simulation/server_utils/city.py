@@ -2,63 +2,83 @@
 City object, to simulate a bunch of houses consuming electricity
 """
 from multiprocessing import Barrier
-from random import randint, random
 
 from colorama import Fore, Style, Back
 
 from .serverprocess import ServerProcess
 from .home import Home
+from .housetable import HouseTable
 from .sharedvars import SharedVariables
+from .trace import Trace
+from .transport import Transport
 
 
 class City(ServerProcess):
     """
     City object, used to simulate a group of electricity-consuming houses
-    Basically creates a bunch of home processes
+    Basically creates a bunch of home processes, playing the local houses of the house table
     """
 
     def __init__(
         self,
         shared_variables: SharedVariables,
-        ipc_key_houses: int,
-        nb_houses: int,
-        average_conso: int,
-        max_prod: int,
+        transport: Transport,
+        table: HouseTable,
+        trace: Trace = None,
+        houses_per_process: int = 1,
     ):
         super().__init__(shared_variables)
-        self.nb_houses = nb_houses
+        self.table = table  # Parameters and state of the houses
+        self.nb_houses = table.local_houses
+        self.trace = trace  # Consumption and production of the houses to replay, if any
 
-        # once all the houses has called the barrier, we just need the city's call
-        self.home_barrier = Barrier(self.nb_houses + 1)
+        groups = City.groups(self.nb_houses, houses_per_process)
+
+        # once all the home processes has called the barrier, we just need the city's call
+        # to begin the turn
+        self.home_barrier = Barrier(len(groups) + 1)
 
         self.homes = [
             Home(
-                house_type=randint(1, 3),  # type of house
-                ipc_key=ipc_key_houses,
+                table=table,
+                transport=transport,
                 home_barrier=self.home_barrier,
-                weather_shared=shared_variables.weather_shared,
-                average_conso=average_conso,
-                prod_average=int(max_prod * random()),
-                pid=home_pid + 1,  # can't be null
+                shared_variables=shared_variables,
+                houses=houses,
+                trace=trace,
             )
-            for home_pid in range(self.nb_houses)
+            for houses in groups
         ]
+        for slot, home in enumerate(self.homes):
+            home.monitor_slot = slot
 
         print(
-            f"\nStarting city with {Fore.BLACK}{Back.WHITE}{self.nb_houses}{Style.RESET_ALL} houses"
+            f"\nStarting city with {Fore.BLACK}{Back.WHITE}{self.nb_houses}{Style.RESET_ALL} houses "
+            f"in {len(self.homes)} processes"
         )
         for home in self.homes:
             home.start()
 
-    def update(self):
+    @staticmethod
+    def groups(nb_houses: int, houses_per_process: int) -> list:
         """
-        For the update phase, the city
+        :param nb_houses: number of local houses
+        :param houses_per_process: number of houses played by each home process
+        :return: the ranges of the pids played by each home process, the last one
+                 playing the remaining houses. Pids can't be null
         """
-        self.home_barrier.wait()
+        return [
+            range(first_pid, min(first_pid + houses_per_process, nb_houses + 1))
+            for first_pid in range(1, nb_houses + 1, houses_per_process)
+        ]
 
-    def kill(self) -> None:
+    def update(self):
         """
-        Kills softly the process
+        For the update phase, the city lets the houses begin the turn,
+        once they all got the bill of the previous one
         """
-        print(f"{Fore.RED}Stopping city{Style.RESET_ALL}")
-        super().kill()
+        if self.trace:
+            # Load the next turns of the houses while this one is simulated
+            self.trace.prefetch(self.turn)
+
+        self.home_barrier.wait()
@@ -0,0 +1,293 @@
+"""
+Gateway exposing the client and house protocols over TCP,
+so that clients and remote houses can run on other machines
+"""
+import asyncio
+import socket
+import struct
+from threading import Thread
+from time import monotonic
+from typing import Callable
+
+from colorama import Fore, Style
+
+from .home import TYPES
+from .housetable import HouseTable
+from .sharedvars import SharedVariables
+from .transport import Transport, TransportBusy
+
+# Every frame is prefixed by the length of its payload, as a 4 bytes big-endian integer
+FRAME_HEADER = struct.Struct(">I")
+MAX_FRAME_SIZE = 1 << 20
+
+# Time between two polls of the transport or of the turn counter, in seconds
+POLL_INTERVAL = 0.005
+
+
+async def read_frame(reader: asyncio.StreamReader) -> str:
+    """
+    Reads a length-prefixed frame from a stream
+    :param reader: the stream to read from
+    :return: the decoded payload
+    """
+    (length,) = FRAME_HEADER.unpack(await reader.readexactly(FRAME_HEADER.size))
+    if length > MAX_FRAME_SIZE:
+        raise ConnectionError(f"Frame of {length} bytes is too large")
+    return (await reader.readexactly(length)).decode()
+
+
+async def write_frame(writer: asyncio.StreamWriter, payload: str) -> None:
+    """
+    Writes a length-prefixed frame to a stream
+    :param writer: the stream to write to
+    :param payload: the message to send
+    """
+    message = payload.encode()
+    writer.write(FRAME_HEADER.pack(len(message)) + message)
+    await writer.drain()
+
+
+def send_frame(connection: socket.socket, payload: str) -> None:
+    """
+    Sends a length-prefixed frame on a blocking socket
+    :param connection: the connected socket
+    :param payload: the message to send
+    """
+    message = payload.encode()
+    connection.sendall(FRAME_HEADER.pack(len(message)) + message)
+
+
+def receive_frame(connection: socket.socket) -> str:
+    """
+    Receives a length-prefixed frame from a blocking socket
+    :param connection: the connected socket
+    :return: the decoded payload
+    """
+
+    def receive_exactly(length: int) -> bytes:
+        data = b""
+        while len(data) < length:
+            chunk = connection.recv(length - len(data))
+            if not chunk:
+                raise ConnectionError("Connection closed by the gateway")
+            data += chunk
+        return data
+
+    (length,) = FRAME_HEADER.unpack(receive_exactly(FRAME_HEADER.size))
+    return receive_exactly(length).decode()
+
+
+class Gateway(Thread):
+    """
+    Thread of the server running an asyncio event loop, which multiplexes
+    every TCP connection. Two protocols are served :
+    - the client protocol : "report", "history", "stats" and "end",
+      answered by the server exactly as through the IPC message queue
+    - the house protocol, for houses running on remote machines :
+      "weather;pid" waits for the next turn and returns "temp;coverage",
+      "house;pid;type;total" reports the house to the market and returns its bill
+    A remote house which didn't report within house_timeout seconds of the
+    beginning of a turn, for instance on a dead machine, is stood in for :
+    the gateway reports it with a null total, so that the turn can end
+    """
+
+    def __init__(
+        self,
+        host: str,
+        port: int,
+        handler: Callable[[str], str],
+        transport: Transport,
+        shared_variables: SharedVariables,
+        table: HouseTable,
+        remote_houses: range,
+        house_timeout: float,
+    ):
+        super().__init__(daemon=True)
+        self.host = host
+        self.port = port
+        self.handler = handler  # Answers the client requests
+        self.transport = transport
+        self.shared_variables = shared_variables
+        self.table = table  # Rows of the remote houses, read by the market
+        self.remote_houses = remote_houses  # Pids the remote houses can use
+        self.house_timeout = (
+            house_timeout  # Time given to the remote houses, 0 for ever
+        )
+
+        self.last_turn = {}  # Last turn each remote house reported in
+        # Futures of the remote houses waiting for their bill, None if stood in for
+        self.bills = {}
+
+    def run(self) -> None:
+        """
+        Runs the event loop until the server stops
+        """
+        asyncio.run(self.serve())
+
+    async def serve(self) -> None:
+        """
+        Accepts connections, and collects the bills of the remote houses
+        """
+        server = await asyncio.start_server(self.handle, self.host, self.port)
+        print(
+            f"{Fore.GREEN}Gateway listening on {self.host}:{self.port}{Style.RESET_ALL}"
+        )
+        async with server:
+            await asyncio.gather(
+                server.serve_forever(), self.collect_bills(), self.watch_turns()
+            )
+
+    async def handle(
+        self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter
+    ) -> None:
+        """
+        Answers the requests of a connection until it is closed
+        """
+        try:
+            while True:
+                request = await read_frame(reader)
+                await write_frame(writer, await self.answer(request))
+        except (asyncio.IncompleteReadError, ConnectionError):
+            pass
+        finally:
+            writer.close()
+
+    async def answer(self, request: str) -> str:
+        """
+        Builds the response to a request
+        :param request: a client or house request
+        :return: the response
+        """
+        command, *arguments = request.split(";")
+
+        try:
+            if command == "weather":
+                return await self.weather(int(arguments[0]))
+            if command == "house":
+                return await self.house(
+                    int(arguments[0]), int(arguments[1]), float(arguments[2])
+                )
+        except (IndexError, ValueError):
+            return "error"
+
+        # Client requests may block on shared memory locks, keep them off the event loop
+        return await asyncio.get_running_loop().run_in_executor(
+            None, self.handler, request
+        )
+
+    async def weather(self, house: int) -> str:
+        """
+        Waits for a new turn to begin for a remote house
+        :param house: the pid of the house
+        :return: "temp;coverage"
+        """
+        if house not in self.remote_houses:
+            return "error"
+
+        await self.wait_turn(house)
+
+        return ";".join(
+            map(str, self.shared_variables.get_weather(self.current_turn()))
+        )
+
+    async def house(self, house: int, house_type: int, total: float) -> str:
+        """
+        Sends the report of a remote house to the market and waits for its bill
+        :param house: the pid of the house
+        :param house_type: the behaviour of the house
+        :param total: consumption minus production of the house
+        :return: the bill
+        """
+        if house not in self.remote_houses or self.bills.get(house):
+            return "error"
+        if house_type not in TYPES:
+            return "error"
+
+        # A house reports once per turn, like the local ones do with their barrier,
+        # once the bill of the report stood in for it is collected
+        await self.wait_turn(house)
+        while house in self.bills:
+            await asyncio.sleep(POLL_INTERVAL)
+        self.last_turn[house] = self.current_turn()
+
+        bill = asyncio.get_running_loop().create_future()
+        self.bills[house] = bill
+
+        # Only the total of a remote house is known, its production is left null
+        self.table.types[house - 1] = house_type
+        self.table.consumptions[house - 1] = total
+        self.transport.send_report(house, str(total).encode())
+
+        return await bill
+
+    async def collect_bills(self) -> None:
+        """
+        Polls the transport for the bills of the remote houses
+        """
+        while True:
+            for house, bill in list(self.bills.items()):
+                try:
+                    message = self.transport.receive_bill(house, block=False)
+                except TransportBusy:
+                    continue
+
+                del self.bills[house]
+                if bill:
+                    bill.set_result(message.decode())
+
+            await asyncio.sleep(POLL_INTERVAL)
+
+    async def watch_turns(self) -> None:
+        """
+        Stands in for the remote houses late in every turn
+        """
+        if not self.house_timeout:
+            return
+
+        while True:
+            turn = self.current_turn()
+            deadline = monotonic() + self.house_timeout
+            while self.current_turn() == turn and monotonic() < deadline:
+                await asyncio.sleep(POLL_INTERVAL)
+
+            if self.current_turn() == turn:
+                self.stand_in(turn)
+                while self.current_turn() == turn:
+                    await asyncio.sleep(POLL_INTERVAL)
+
+    def stand_in(self, turn: int) -> None:
+        """
+        Reports a null total for the remote houses which didn't report in a turn
+        :param turn: the turn the simulation is in
+        """
+        missing = [
+            house
+            for house in self.remote_houses
+            if self.last_turn.get(house, -1) < turn and house not in self.bills
+        ]
+        if missing:
+            print(
+                f"{Fore.RED}Remote houses {', '.join(map(str, missing))} didn't report "
+                f"within {self.house_timeout}s, standing in for them{Style.RESET_ALL}"
+            )
+
+        for house in missing:
+            self.last_turn[house] = turn
+            self.bills[house] = None
+            self.table.consumptions[house - 1] = 0
+            self.transport.send_report(house, b"0")
+
+    async def wait_turn(self, house: int) -> None:
+        """
+        Waits until the simulation is past the last turn a house reported in
+        :param house: the pid of the house
+        """
+        while self.current_turn() <= self.last_turn.get(house, -1):
+            await asyncio.sleep(POLL_INTERVAL)
+
+    def current_turn(self) -> int:
+        """
+        :return: the turn the simulation is in
+        """
+        with self.shared_variables.turn_shared.get_lock():
+            return self.shared_variables.turn_shared.value
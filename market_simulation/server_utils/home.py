@@ -1,113 +1,115 @@
 """
-Home process, used to simulate a house
+Home process, used to simulate a group of houses
 """
 
-from sys import setrecursionlimit
-from multiprocessing import Process, Barrier, Array
+from multiprocessing import Process, Barrier
 from random import randint, random
 
-import sysv_ipc
 from colorama import Fore, Style
 
-setrecursionlimit(10 ** 6)  # Don't judge me okay
+from .housetable import HouseTable
+from .sharedvars import SharedVariables
+from .trace import Trace
+from .transport import Transport
+
 TYPES = {1: "Give", 2: "Sell", 3: "Both"}  # Defining household types
 
 
 class Home(Process):
     """
-    Home class, instantiated by a city, which simulates a home
-    consuming electricity following a specific behavior
+    Home class, instantiated by a city, which simulates a group of homes
+    consuming electricity following their specific behavior, one after the other.
+    Their parameters and state are kept in their rows of the house table :
+    the process only holds the range of their pids
     """
 
     def __init__(
         self,
-        house_type: int,
-        ipc_key: int,
+        table: HouseTable,
+        transport: Transport,
         home_barrier: Barrier,
-        weather_shared: Array,
-        average_conso: int,
-        prod_average: int,
-        pid: int,
+        shared_variables: SharedVariables,
+        houses: range,
+        trace: Trace = None,
     ):
         super().__init__()
 
-        self.house_type = house_type
-        self.weather_shared = weather_shared
+        self.table = table
+        self.shared_variables = shared_variables
         self.home_barrier = home_barrier
-        self.base_production = prod_average
-        self.production = prod_average  # initial conditions
-        self.conso = average_conso  # initial conditions
-        self.bill = 0
 
-        self.market_mq = sysv_ipc.MessageQueue(ipc_key)
-        self.home_pid = pid
+        self.transport = transport  # Used to communicate with the market
+        self.houses = houses  # Pids of the houses, each one at row pid - 1 of the table
+        self.name = (
+            f"house {houses.start}"
+            if len(houses) == 1
+            else f"houses {houses.start}-{houses[-1]}"
+        )
+        self.monitor_slot = None  # Slot in the soak monitor, given by the city
+        self.turn = 0
+        self.trace = trace  # Consumption and production to replay, if any
 
     def run(self) -> None:
         """
-        Run the exchange with the market, and catch the interruption
+        Run the exchanges with the market, and catch the interruption
         """
+        self.transport.attach(self.houses)
         try:
-            self.transaction()
+            while True:
+                self.transaction()
+
+                if self.shared_variables.monitor:
+                    self.shared_variables.monitor.record(self.monitor_slot, self.turn)
         except KeyboardInterrupt:
-            print(f"Killing softly the house process {self.home_pid}\n", end="")
+            print(f"Killing softly the process of {self.name}\n", end="")
 
     def transaction(self) -> None:
         """
-        Used in every exchange between the house and the market
-        Computes the production and consumption of the house
+        Used in every exchange between the houses and the market
+        Computes the production and consumption of each house
         """
 
+        # Wait for the city to begin the turn, once the weather is published
+        self.home_barrier.wait()
+
         # Home inhabitants check local weather
         # which influences their decisions on whether or not
         # they'll use electric heating or not (which is a major energy sink)
-        with self.weather_shared.get_lock():
-            temperature = self.weather_shared[0]
-            cloud_coverage = self.weather_shared[1]
-
-        self.conso = Home.get_cons(temperature)
-
-        # Random consumption based on the base value
-
-        # Add the cloud coverage factor, diminishing the production
-        if 0 <= cloud_coverage <= 70:
-            # compute the solar production of each house with a small random factor
-            self.production = (
-                self.base_production + 10 * 1 / cloud_coverage + 2 * random()
-            )
-        elif cloud_coverage > 90 or temperature > 35:
-            self.production = 0
-
-        # Compute the energy situation of the house
-        total = self.conso - self.production
-
-        # Depending on their type, houses might :
-        # `1` : give away the surplus of production
-        # `2` : sell it to the market
-        # `3` : sell it if no takers
-        message = str(self.house_type) + ";" + str(total)
-        self.market_mq.send(message.encode(), type=self.home_pid)
-
-        # Get the bill from the market
-        self.bill = float(
-            self.market_mq.receive(type=self.home_pid + 10 ** 6)[0].decode()
-        )
-        color = Fore.RED if self.bill > 0 else Fore.GREEN
-        color_bill = Fore.RED if total > 0 else Fore.GREEN
-
-        print(
-            f"Updated home {self.home_pid} \t── Type : {Home.get_type(self.house_type)} "
-            f"\t── Bill : {color} {'{:.2f}'.format(self.bill)} "
-            f"€{Style.RESET_ALL} ── "
-            f"Consumed : {color_bill}{'{:.2f}'.format(total)} kWh{Style.RESET_ALL}\n",
-            end="",
-        )
-
-        self.bill = 0  # after the turn the bill is reinitialized
-
-        # All done, now wait the barrier
-        self.home_barrier.wait()
-        # And update again
-        self.run()
+        temperature, cloud_coverage = self.shared_variables.get_weather(self.turn)
+
+        totals = []
+        for home_pid in self.houses:
+            row = home_pid - 1
+            if self.trace:
+                # Replay the consumption and production recorded for this house
+                conso, production = self.trace.read(self.turn, row)
+            else:
+                conso = Home.get_cons(temperature)
+                production = Home.get_prod(
+                    self.table.base_productions[row],
+                    self.table.productions[row],
+                    temperature,
+                    cloud_coverage,
+                )
+
+            # Compute the energy situation of the house
+            self.table.consumptions[row] = conso
+            self.table.productions[row] = production
+            totals.append(conso - production)
+
+            # Depending on their type, read by the market in the table, houses might :
+            # `1` : give away the surplus of production
+            # `2` : sell it to the market
+            # `3` : sell it if no takers
+            self.transport.send_report(home_pid, str(totals[-1]).encode())
+
+        # Get the bills from the market, once every house reported
+        for home_pid, total in zip(self.houses, totals):
+            bill = float(self.transport.receive_bill(home_pid).decode())
+            if not self.shared_variables.shedding():
+                Home.print_bill(home_pid, self.table.types[home_pid - 1], bill, total)
+
+        self.turn += 1
 
     @staticmethod
     def get_cons(temp: int) -> int:
@@ -125,6 +127,51 @@ class Home(Process):
 
         return cons
 
+    @staticmethod
+    def get_prod(
+        base_production: float,
+        production: float,
+        temperature: int,
+        cloud_coverage: int,
+    ) -> float:
+        """
+        Works out the home solar production, taking weather into account
+        :param base_production: the average production of the house
+        :param production: the production of the previous turn
+        :param temperature: the temperature of the day
+        :param cloud_coverage: the cloud coverage of the day
+        :return: the daily energy production in kWh
+        """
+
+        # Add the cloud coverage factor, diminishing the production
+        if 0 <= cloud_coverage <= 70:
+            # compute the solar production of each house with a small random factor
+            return base_production + 10 * 1 / cloud_coverage + 2 * random()
+        if cloud_coverage > 90 or temperature > 35:
+            return 0
+
+        return production
+
+    @staticmethod
+    def print_bill(home_pid: int, house_type: int, bill: float, total: float) -> None:
+        """
+        Displays the outcome of a turn for a house
+        :param home_pid: the pid of the house
+        :param house_type: the behaviour of the house
+        :param bill: the bill sent by the market
+        :param total: consumption minus production of the house
+        """
+        color = Fore.RED if bill > 0 else Fore.GREEN
+        color_bill = Fore.RED if total > 0 else Fore.GREEN
+
+        print(
+            f"Updated home {home_pid} \t── Type : {Home.get_type(house_type)} "
+            f"\t── Bill : {color} {'{:.2f}'.format(bill)} "
+            f"€{Style.RESET_ALL} ── "
+            f"Consumed : {color_bill}{'{:.2f}'.format(total)} kWh{Style.RESET_ALL}\n",
+            end="",
+        )
+
     @staticmethod
     def get_type(behaviour_id: int) -> str:
         """
@@ -133,10 +180,3 @@ class Home(Process):
         :return: str
         """
         return TYPES[behaviour_id]
-
-    def kill(self) -> None:
-        """
-        Kills softly the process
-        """
-        print(f"{Fore.RED}Stopping house {self.home_pid} {Style.RESET_ALL}")
-        super().kill()
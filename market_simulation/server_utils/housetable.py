@@ -0,0 +1,125 @@
+"""
+Table of the house parameters and state, stored column by column
+in shared memory and indexed by the house pid
+"""
+import csv
+from array import array
+from multiprocessing import RawArray
+from random import randint, random
+
+# Columns of the table : name and type code
+COLUMNS = {
+    "types": "b",  # Behaviour of the house, see home.TYPES, 0 until known
+    "base_productions": "d",  # Average production of the house
+    "productions": "d",  # Production of the last turn
+    "consumptions": "d",  # Consumption of the last turn
+    "bills": "d",  # Bill of the last turn, written by the market
+}
+
+
+def shared_column(typecode: str, values) -> RawArray:
+    """
+    Copies a column to shared memory at once
+    :param typecode: the type code of the column
+    :param values: the values of the column, as an array or any buffer
+    :return: the shared array
+    """
+    data = memoryview(values).cast("B")
+    column = RawArray(typecode, len(data) // array(typecode).itemsize)
+    memoryview(column).cast("B")[:] = data
+    return column
+
+
+class HouseTable:
+    """
+    Typed shared arrays with a row per house, at index pid - 1.
+    The table is allocated once, before the houses are started : every process
+    reads it in place, and each house only writes its own row.
+    The local houses are bulk loaded, from a CSV file of "type,base production"
+    lines or generated at random. The rows of the remote houses follow them,
+    filled by the gateway with their type and consumption minus production
+    """
+
+    def __init__(
+        self,
+        types: array,
+        base_productions: array,
+        average_conso: float,
+        remote_houses: int = 0,
+    ):
+        self.local_houses = len(types)
+        self.size = self.local_houses + remote_houses
+
+        self.types = shared_column(
+            COLUMNS["types"], types + array("b", [0]) * remote_houses
+        )
+        base_productions = base_productions + array("d", [0]) * remote_houses
+        self.base_productions = shared_column(
+            COLUMNS["base_productions"], base_productions
+        )
+        self.productions = shared_column(
+            COLUMNS["productions"], base_productions
+        )  # initial conditions
+        self.consumptions = shared_column(
+            COLUMNS["consumptions"], array("d", [average_conso]) * self.size
+        )
+        self.bills = RawArray(COLUMNS["bills"], self.size)
+
+    def copy(self):
+        """
+        :return: a new HouseTable with the rows of the local houses
+        """
+        table = HouseTable.__new__(HouseTable)
+        table.local_houses = table.size = self.local_houses
+        for name, typecode in COLUMNS.items():
+            rows = memoryview(getattr(self, name)).cast("B")
+            length = self.local_houses * array(typecode).itemsize
+            setattr(table, name, shared_column(typecode, rows[:length]))
+        return table
+
+    @staticmethod
+    def generate(
+        nb_houses: int, average_conso: float, max_prod: int, remote_houses: int = 0
+    ):
+        """
+        :param nb_houses: number of local houses
+        :param average_conso: initial consumption of the houses
+        :param max_prod: maximum average production of a house
+        :param remote_houses: number of remote houses
+        :return: a HouseTable of houses of random types and productions
+        """
+        types = array(COLUMNS["types"], (randint(1, 3) for _ in range(nb_houses)))
+        base_productions = array(
+            COLUMNS["base_productions"],
+            (int(max_prod * random()) for _ in range(nb_houses)),
+        )
+        return HouseTable(types, base_productions, average_conso, remote_houses)
+
+    @staticmethod
+    def load(path: str, average_conso: float, remote_houses: int = 0):
+        """
+        :param path: CSV file with a "type,base production" line per local house
+        :param average_conso: initial consumption of the houses
+        :param remote_houses: number of remote houses
+        :return: the HouseTable of these houses
+        """
+        types = array(COLUMNS["types"])
+        base_productions = array(COLUMNS["base_productions"])
+        with open(path, newline="") as file:
+            for line, row in enumerate(csv.reader(file), start=1):
+                if not row:
+                    continue
+                try:
+                    if len(row) != 2:
+                        raise ValueError(f"{len(row)} fields instead of 2")
+                    house_type, base_production = (field.strip() for field in row)
+                    if house_type not in ("1", "2", "3"):
+                        raise ValueError(f"unknown house type {house_type!r}")
+                    base_productions.append(float(base_production))
+                except ValueError as error:
+                    raise ValueError(
+                        f"Line {line} of {path} isn't a 'type,base production' line : "
+                        f"{error}"
+                    ) from error
+                types.append(int(house_type))
+        return HouseTable(types, base_productions, average_conso, remote_houses)
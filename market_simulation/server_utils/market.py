@@ -10,16 +10,24 @@ import signal
 from multiprocessing import Value
 
 from colorama import Fore, Style
-from sysv_ipc import MessageQueue
 
+from .aggregates import Aggregates
+from .analytics import Analytics
 from .serverprocess import ServerProcess
 from .externalfactor import ExternalFactor
+from .housetable import HouseTable
 from .sharedvars import SharedVariables
+from .transport import Transport
+
+# Shortest turn period the signals of the external factors are spaced with, in seconds,
+# so that a null time interval doesn't flood the server with them
+MIN_FACTOR_PERIOD = 0.5
 
 
 class Market(ServerProcess):
     """
-    Instantiated by the server_utils, this class simulates the electricity market
+    Instantiated by the server_utils, this class simulates the electricity market.
+    It reads the type of the houses in the house table, and writes their bills in it
     """
 
     def __init__(
@@ -27,9 +35,11 @@ class Market(ServerProcess):
         shared_variables: SharedVariables,
         politics: int,
         economy: int,
-        nb_houses: int,
-        ipc_house: int,
+        table: HouseTable,
+        transport: Transport,
         time_interval: int,
+        top_k: int = 5,
+        analytics: Analytics = None,
     ):
         super().__init__(shared_variables)
 
@@ -43,16 +53,18 @@ class Market(ServerProcess):
         with self.economy.get_lock():
             self.economy.value = economy
 
-        self.nb_houses = nb_houses  # Number of houses
-        self.mq_house = MessageQueue(
-            ipc_house
-        )  # Message queue to communicate with houses
+        self.table = table  # Parameters and state of the houses
+        self.nb_houses = table.size  # Number of houses
+        self.transport = transport  # Used to communicate with houses
         self.daily_consumption = Value(
             "d"
         )  # Total consumption of the houses on this day
         self.surplus = Value("d")  # Surplus of production
         self.waiting_houses = collections.deque()  # Free energy waiting queue
         self.waiting_lock = multiprocessing.Lock()  # Lock to access this queue
+        # Statistics of the last settled turn, and of the whole run
+        self.aggregates = Aggregates(top_k)
+        self.analytics = analytics or Analytics()
 
         # Set default values
         with self.daily_consumption.get_lock():
@@ -67,29 +79,30 @@ class Market(ServerProcess):
         self.alpha = [0.0001, 0.0001, 0.000001]
         self.beta = [0.025, 0.025, 0.025]
 
+        # Listen for signals, before the external factors can send them
+        signal.signal(signal.SIGUSR1, self.signal_handler)
+        signal.signal(signal.SIGUSR2, self.signal_handler)
+
         # Politics : score between 0 and 100.
         # SIGUSR1 : politics situation deteriorates
         # SIGUSR2 : economics situation deteriorates
         self.market_pid = os.getpid()
+        period = max(time_interval, MIN_FACTOR_PERIOD)
         self.politics_process = ExternalFactor(
             ppid=self.market_pid,
             name="politics",
             signal_code=signal.SIGUSR1,
-            delay=time_interval * 6,
+            delay=period * 6,
         )
         self.economics_process = ExternalFactor(
             ppid=self.market_pid,
             name="economics",
             signal_code=signal.SIGUSR2,
-            delay=time_interval * 7,
+            delay=period * 7,
         )
         self.economics_process.start()
         self.politics_process.start()
 
-        # Listen for signals
-        signal.signal(signal.SIGUSR1, self.signal_handler)
-        signal.signal(signal.SIGUSR2, self.signal_handler)
-
     def signal_handler(self, sig, _):
         """
         Decreases the economical or political score when a signal is sent
@@ -104,14 +117,24 @@ class Market(ServerProcess):
             with self.economy.get_lock():
                 self.economy.value = max(1, self.economy.value - 30)
 
+    def run(self):
+        """
+        Releases the channels of the houses, then runs the turns
+        """
+        self.transport.attach()
+        super().run()
+
     def transaction(self, message: str, house: int):
         """
         Performs a transaction asynchronously with a house
-        :param message: the ipc queue raw message received
+        :param message: the ipc queue raw message received, the consumption
+                        minus production of the house
         :param house: the pid of the house process
         """
-        behaviour, consumption = map(float, message.decode().split(";"))
-        behaviour = int(behaviour)
+        consumption = float(message.decode())
+        behaviour = self.table.types[house - 1]
+        self.aggregates.add_report(house, behaviour, consumption)
+        self.analytics.add_report(consumption)
 
         # Increase the daily energy sold and bought
         with self.daily_consumption.get_lock():
@@ -156,6 +179,7 @@ class Market(ServerProcess):
                         )
                         # and put it back in the first position of the queue
                         self.waiting_houses.appendleft((house_giving, surplus_house))
+                        self.aggregates.add_given(consumption)
                         consumption = 0
                     else:  # All the surplus energy is consumed
                         print(
@@ -164,8 +188,9 @@ class Market(ServerProcess):
                             end="",
                         )
                         consumption -= surplus_house
+                        self.aggregates.add_given(surplus_house)
                         # Tell the giver house its energy has been taken for free
-                        self.mq_house.send("0".encode(), type=house_giving + 10 ** 6)
+                        self.send_bill(house_giving, 0)
 
         else:  # If production > consumption
             if behaviour == 1:  # Gives away production
@@ -176,11 +201,13 @@ class Market(ServerProcess):
                     f"surplus is now {'{:.2f}'.format(self.surplus.value)}kWh\n",
                     end="",
                 )
+                self.aggregates.add_given(-consumption)
                 consumption = 0
             elif behaviour == 2:  # The house sells its excess production
                 print(
                     f"House {house} sold {'{:.2f}'.format(-consumption)}kWh.\n", end=""
                 )
+                self.aggregates.add_sold(-consumption)
             elif (
                 behaviour == 3
             ):  # Put energy on wait queue to give it later, and eventually sell it if no takers
@@ -189,16 +216,23 @@ class Market(ServerProcess):
                     end="",
                 )
                 with self.waiting_lock:
-                    self.waiting_houses.append((house, consumption))
+                    self.waiting_houses.append((house, -consumption))
                 return  # Don't return the bill now, do it later
 
-        # Get the current price
-        with self.shared_variables.price_shared.get_lock():
-            # Send back the bill price to the house
-            self.mq_house.send(
-                str(consumption * self.shared_variables.price_shared.value).encode(),
-                type=house + 10 ** 6,
-            )
+        # Send back the bill price to the house, at the current price
+        price_kwh = self.shared_variables.get_price(self.turn)
+        self.send_bill(house, consumption * price_kwh)
+
+    def send_bill(self, house: int, bill: float) -> None:
+        """
+        Records the bill of a house and sends it
+        :param house: the pid of the house
+        :param bill: the amount of the bill, negative if the house is paid
+        """
+        self.table.bills[house - 1] = bill
+        self.aggregates.add_bill(self.table.types[house - 1], bill)
+        self.analytics.add_bill(bill)
+        self.transport.send_bill(house, str(bill).encode())
 
     def update(self) -> None:
         """
@@ -207,51 +241,58 @@ class Market(ServerProcess):
         """
         with concurrent.futures.ThreadPoolExecutor(max_workers=self.workers) as pool:
             for _ in range(self.nb_houses):
-                message, house = self.mq_house.receive()
+                message, house = self.transport.receive_report()
                 pool.submit(self.transaction, message, house)
 
-        with self.shared_variables.price_shared.get_lock():
-            price_kwh = self.shared_variables.price_shared.value
+        self.settle_waiting()
+
+    def settle_waiting(self) -> None:
+        """
+        Ends the turn once every house has reported,
+        buying the surplus nobody took from the waiting houses
+        """
+        price_kwh = self.shared_variables.get_price(self.turn)
 
         # Type 3 houses (sell if no takers) if all the surplus isn't totally consumed
         while self.waiting_houses:
             house_giving, surplus_house = self.waiting_houses.popleft()
-            bill = price_kwh * surplus_house
-            self.mq_house.send(str(bill).encode(), type=house_giving + 10 ** 6)
+            self.send_bill(
+                house_giving, -price_kwh * surplus_house
+            )  # The house is paid
+            self.aggregates.add_sold(surplus_house)
             print(
-                f"No takers, buying {'{:.2f}'.format(-surplus_house)}kWh from house {house_giving}"
+                f"No takers, buying {'{:.2f}'.format(surplus_house)}kWh from house {house_giving}"
             )
 
         # Reset surplus
         with self.surplus.get_lock():
             self.surplus.value = 0
 
+        self.aggregates.publish(self.turn)
+        self.analytics.end_turn(price_kwh)
+
     def write(self) -> None:
         """
         Update the cost of a kWh after the turn is over
         """
 
         # Get the weather conditions
-        with self.shared_variables.weather_shared.get_lock():
-            temperature = self.shared_variables.weather_shared[0]
-            cloud_coverage = self.shared_variables.weather_shared[1]
+        temperature, cloud_coverage = self.shared_variables.get_weather(self.turn)
 
-        # Update the price
+        # Update the price for the next turn
         self.daily_consumption.get_lock().acquire()
         self.politics.get_lock().acquire()
         self.economy.get_lock().acquire()
-        with self.shared_variables.price_shared.get_lock():
-            self.shared_variables.price_shared.value = (
-                self.gamma * self.shared_variables.price_shared.value
-                + self.alpha[0] * 1 / (16 + temperature)
-                + self.alpha[1] * cloud_coverage
-                + self.alpha[2] * self.daily_consumption.value
-                + self.beta[0] * 1 / self.politics.value
-                + self.beta[1] * 1 / self.economy.value
-            )
-            print(
-                f"{Fore.BLUE}New price is {round(self.shared_variables.price_shared.value, 2)} €/kWh{Style.RESET_ALL}"
-            )
+        price_kwh = (
+            self.gamma * self.shared_variables.get_price(self.turn)
+            + self.alpha[0] * 1 / (16 + temperature)
+            + self.alpha[1] * cloud_coverage
+            + self.alpha[2] * self.daily_consumption.value
+            + self.beta[0] * 1 / self.politics.value
+            + self.beta[1] * 1 / self.economy.value
+        )
+        self.shared_variables.set_price(self.turn + 1, price_kwh)
+        print(f"{Fore.BLUE}New price is {round(price_kwh, 2)} €/kWh{Style.RESET_ALL}")
         self.daily_consumption.get_lock().release()
         self.politics.get_lock().release()
         self.economy.get_lock().release()
@@ -269,14 +310,11 @@ class Market(ServerProcess):
                 f"{Fore.MAGENTA}Politics situation: {self.politics.value}/100{Style.RESET_ALL}"
             )
 
-    def kill(self):
-        """
-        Kills softly the child processes and then himself
-        """
-
-        print(f"{Fore.RED}Stopping market, politics and economics{Style.RESET_ALL}")
-
-        self.politics_process.kill()
-        self.economics_process.kill()
-
-        super().kill()
+        # Report the state of the transport, to spot houses waiting on a full channel
+        stats = self.transport.stats()
+        print(
+            f"{Fore.CYAN}Transport {stats['backend']} : {stats['pending']} pending, "
+            f"high water {stats['high_water']}, capacity {stats['capacity']} ── "
+            f"{stats['blocked_sends']} blocked sends "
+            f"({'{:.3f}'.format(stats['blocked_time'])}s){Style.RESET_ALL}"
+        )
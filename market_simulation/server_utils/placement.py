@@ -0,0 +1,118 @@
+"""
+Placement of the simulation processes on the CPU cores,
+keeping the market and the server away from the houses
+"""
+import os
+
+from colorama import Fore, Style
+
+# Roles of the processes : the market and the server get their own cores,
+# the houses and the other processes (workers) share the remaining ones
+ROLES = ("market", "server", "workers", "houses")
+
+
+def format_cores(cores: list) -> str:
+    """
+    :param cores: sorted list of core numbers
+    :return: the cores as ranges, such as "0-3,6"
+    """
+    ranges = []
+    for core in cores:
+        if ranges and core == ranges[-1][1] + 1:
+            ranges[-1][1] = core
+        else:
+            ranges.append([core, core])
+    return ",".join(
+        str(first) if first == last else f"{first}-{last}" for first, last in ranges
+    )
+
+
+class Placement:
+    """
+    Placement policy, pinning the processes to cores and setting their nice level
+    once they are started. Linux applies both per thread : every thread already
+    running is placed, such as the reader thread of the asyncio market,
+    and the threads created afterwards inherit the placement of their creator
+    """
+
+    def __init__(
+        self, market_cores: list, server_cores: list, spread: bool, nice: dict
+    ):
+        available = sorted(os.sched_getaffinity(0))
+        for core in market_cores + server_cores:
+            if core not in available:
+                raise ValueError(
+                    f"Core {core} is not available, use {format_cores(available)}"
+                )
+
+        self.cores = {"market": sorted(market_cores), "server": sorted(server_cores)}
+        self.cores["workers"] = [
+            core for core in available if core not in market_cores + server_cores
+        ]
+        if not self.cores["workers"]:
+            print(
+                f"{Fore.YELLOW}No core left for the houses, "
+                f"they share all of them{Style.RESET_ALL}"
+            )
+            self.cores["workers"] = available
+        self.cores["houses"] = self.cores["workers"]
+
+        # Any role without dedicated cores runs anywhere
+        for role in ("market", "server"):
+            self.cores[role] = self.cores[role] or available
+
+        self.spread = spread  # Pin every house and worker to a single core, in turn
+        self.nice = nice  # Nice level of each role
+        self.next_core = 0  # Next shared core to pin a process to
+
+    @staticmethod
+    def threads(pid: int) -> list:
+        """
+        :param pid: the pid of a process, 0 for the calling one
+        :return: the native ids of its threads
+        """
+        try:
+            return [int(tid) for tid in os.listdir(f"/proc/{pid or os.getpid()}/task")]
+        except FileNotFoundError as error:
+            raise ProcessLookupError(pid) from error
+
+    def place(self, role: str, pid: int) -> (list, int):
+        """
+        Pins every thread of a process to the cores of its role,
+        and sets their nice level
+        :param role: one of ROLES
+        :param pid: the pid of the process, 0 for the calling one
+        :return: the cores and the nice level of the process
+        """
+        cores = self.cores[role]
+        if self.spread and role in ("workers", "houses"):
+            cores = [cores[self.next_core % len(cores)]]
+            self.next_core += 1
+
+        for tid in Placement.threads(pid):
+            try:
+                os.sched_setaffinity(tid, cores)
+                if os.getpriority(os.PRIO_PROCESS, tid) != self.nice[role]:
+                    os.setpriority(os.PRIO_PROCESS, tid, self.nice[role])
+            except ProcessLookupError:
+                continue  # The thread ended meanwhile
+            except PermissionError:
+                pass  # Lowering the nice level needs privileges, keep the current one
+
+        return cores, os.getpriority(os.PRIO_PROCESS, pid)
+
+    def apply(self, processes: list) -> None:
+        """
+        Places processes and reports their placement
+        :param processes: list of (role, name, pid) tuples
+        """
+        for role, name, pid in processes:
+            try:
+                cores, nice = self.place(role, pid)
+            except ProcessLookupError:
+                continue  # Already stopped
+
+            print(
+                f"{Fore.CYAN}{name} ({role}, pid {pid or os.getpid()}) : "
+                f"cores {format_cores(cores)}, nice {nice}{Style.RESET_ALL}"
+            )
@@ -0,0 +1,133 @@
+"""
+Fixed-rate schedule of the turns, following absolute deadlines
+so that the period doesn't drift with the time the turns take
+"""
+from multiprocessing import Array, Event
+from time import monotonic, sleep
+
+# Policies once a turn overran its deadline, the next turn starting right away :
+#   - catch_up : keep the deadlines, late turns run back to back until back on schedule
+#   - skip : drop the missed periods, the schedule starts over from the late turn
+POLICIES = ("catch_up", "skip")
+
+
+class Scheduler:
+    """
+    Schedule followed by the sync process, turn n ending at start + n * interval.
+    The overruns are counted in shared memory : (overruns, total lateness,
+    maximum lateness, late, time held), so that the server reports them and
+    the processes shed their logging while the simulation is late, if enabled.
+    The server can also hold the simulation at a turn boundary : checkpoint is the
+    action of the last barrier of a turn, run once every process waits on it
+    """
+
+    def __init__(self, interval: float, policy: str, shed_logging: bool):
+        if policy not in POLICIES:
+            raise ValueError(f"Unknown overrun policy {policy}, expected {POLICIES}")
+        if interval < 0:
+            raise ValueError(f"The time interval can't be negative, got {interval}")
+
+        self.interval = interval  # Period of the turns, in seconds
+        self.policy = policy
+        self.shed_logging = shed_logging  # Silence the turns following an overrun
+        self.deadline = None  # Monotonic time the current turn should end at
+        self.held_time = 0  # Time held already taken into account in the deadline
+        self.stats = Array("d", 5)
+        self.running = Event()  # Cleared by the server to hold the simulation
+        self.running.set()
+        self.held = Event()  # Set once the simulation is held
+
+    def begin(self) -> None:
+        """
+        Starts the schedule with the current turn
+        """
+        self.deadline = monotonic() + self.interval
+
+    def wait(self) -> float:
+        """
+        Waits for the end of the current turn, and sets the deadline of the next one
+        :return: the lateness of the turn in seconds, 0 if it ended on time
+        """
+        if self.deadline is None:
+            self.begin()
+
+        # The time the simulation was held doesn't count as lateness
+        with self.stats.get_lock():
+            held_time = self.stats[4]
+        self.deadline += held_time - self.held_time
+        self.held_time = held_time
+
+        lateness = monotonic() - self.deadline
+        if lateness <= 0:
+            sleep(-lateness)
+            lateness = 0
+            self.deadline += self.interval
+        elif self.policy == "skip":
+            self.deadline = monotonic() + self.interval
+        else:
+            self.deadline += self.interval
+
+        # A null interval runs the turns as fast as possible, they can't be late
+        if self.interval <= 0:
+            lateness = 0
+
+        with self.stats.get_lock():
+            if lateness:
+                self.stats[0] += 1
+                self.stats[1] += lateness
+                self.stats[2] = max(self.stats[2], lateness)
+            self.stats[3] = 1 if lateness else 0
+
+        return lateness
+
+    def checkpoint(self) -> None:
+        """
+        Action of the last barrier of a turn, run by the last process reaching it :
+        if the server asked for it, holds every process until released
+        """
+        if self.running.is_set():
+            return
+
+        start = monotonic()
+        self.held.set()
+        self.running.wait()
+        self.held.clear()
+
+        with self.stats.get_lock():
+            self.stats[4] += monotonic() - start
+
+    def hold(self, timeout: float) -> bool:
+        """
+        Holds the simulation at the end of the current turn
+        :param timeout: longest wait for the turn to end, in seconds
+        :return: True once held, False if the turn didn't end in time
+        """
+        self.running.clear()
+        if self.held.wait(timeout):
+            return True
+
+        self.running.set()  # Give up, the turn goes on
+        return False
+
+    def release(self) -> None:
+        """
+        Resumes the simulation
+        """
+        self.running.set()
+
+    def shedding(self) -> bool:
+        """
+        :return: True if the processes should skip their logging this turn
+        """
+        if not self.shed_logging:
+            return False
+        with self.stats.get_lock():
+            return bool(self.stats[3])
+
+    def overruns(self) -> (int, float, float):
+        """
+        :return: the number of turns which overran, their total and maximum lateness
+        """
+        with self.stats.get_lock():
+            overruns, lateness, max_lateness = self.stats[:3]
+        return int(overruns), lateness, max_lateness
@@ -1,7 +1,12 @@
 """
 Defines abstract class from which every server_utils class derives
 """
+import contextlib
+import os
 from multiprocessing import Process
+
+from colorama import Fore, Style
+
 from .sharedvars import SharedVariables
 
 
@@ -10,17 +15,50 @@ class ServerProcess(Process):
     Abstract class used to define the common behavior between server_utils subprocess
     """
 
+    SHEDS_LOGGING = True  # Silenced while the simulation is late, if enabled
+
     def __init__(self, shared_variables: SharedVariables):
         super().__init__()
         self.shared_variables = shared_variables
+        self.turn = 0
+        self.monitor_slot = None  # Slot in the soak monitor, given by the server
 
     def run(self):
         """
         Method called when the process starts
-        Calls compute and write barriers
+        Calls compute and write barriers, turn after turn
         """
 
         try:
+            while True:
+                self.step()
+        except KeyboardInterrupt:
+            print(
+                "Process received interruption signal, killing softly the process\n",
+                end="",
+            )
+
+    def step(self) -> None:
+        """
+        Runs a turn of the simulation, without logging if the previous one overran
+        """
+        if self.SHEDS_LOGGING and self.shared_variables.shedding():
+            with open(os.devnull, "w") as devnull, contextlib.redirect_stdout(devnull):
+                self.play()
+        else:
+            self.play()
+
+    def play(self) -> None:
+        """
+        Goes through the phases of a turn
+        """
+        if self.shared_variables.pipelined:
+            # The next turn's state is written in the other buffer,
+            # so the write phase doesn't need to wait for the other processes
+            self.update()
+            self.write()
+            self.shared_variables.compute_barrier.wait()
+        else:
             # Wait for every simulation object to call the compute barrier
             self.update()
             self.shared_variables.compute_barrier.wait()
@@ -29,12 +67,21 @@ class ServerProcess(Process):
             self.write()
             self.shared_variables.write_barrier.wait()
 
-            # Then runs again
-            self.run()
-        except KeyboardInterrupt:
+        self.turn += 1
+        self.report()
+
+    def report(self) -> None:
+        """
+        Reports the memory used by the process, in soak mode
+        """
+        if not self.shared_variables.monitor:
+            return
+
+        growth = self.shared_variables.monitor.record(self.monitor_slot, self.turn)
+        if growth is not None:
             print(
-                "Process received interruption signal, killing softly the process\n",
-                end="",
+                f"{Fore.CYAN}{self.name} : turn {self.turn}, "
+                f"RSS growth {growth // 1024} kB{Style.RESET_ALL}"
             )
 
     def update(self) -> None:
@@ -2,14 +2,83 @@
 Provides a dataclass for shared variables across server processes
 """
 from dataclasses import dataclass
-from multiprocessing import Barrier, Value
+from multiprocessing import Array, Barrier, Value
+
+from .scheduler import Scheduler
+from .soak import SoakMonitor
+
+# Number of turns kept in the history : (turn, price, temperature, cloud coverage)
+HISTORY_SIZE = 100
+HISTORY_FIELDS = 4
 
 
 @dataclass
 class SharedVariables:
-    """Shared variables used across the server processes"""
+    """
+    Shared variables used across the server processes
+    The price and the weather are double-buffered : price_shared holds one price
+    and weather_shared one (temperature, cloud coverage) pair per buffer
+    """
 
     compute_barrier: Barrier
     write_barrier: Barrier
-    price_shared: Value
-    weather_shared: Value
+    price_shared: Array
+    weather_shared: Array
+    turn_shared: Value
+    history_shared: Array
+    pipelined: bool = False
+    monitor: SoakMonitor = None  # Memory monitoring, in soak mode
+    scheduler: Scheduler = None  # Schedule of the turns, followed by the sync process
+
+    def shedding(self) -> bool:
+        """
+        :return: True if the processes should skip their logging, the simulation being late
+        """
+        return self.scheduler is not None and self.scheduler.shedding()
+
+    def buffer(self, turn: int) -> int:
+        """
+        Index of the buffer holding the state a turn is computed with.
+        In pipelined mode, the state of the next turn is written in the other buffer
+        while the current one is read. Otherwise it is updated in place,
+        the write barrier keeping it from being read at the same time
+        :param turn: the turn number
+        :return: 0 or 1
+        """
+        return turn % 2 if self.pipelined else 0
+
+    def get_price(self, turn: int) -> float:
+        """
+        :param turn: the turn number
+        :return: the price of a kWh during this turn
+        """
+        with self.price_shared.get_lock():
+            return self.price_shared[self.buffer(turn)]
+
+    def set_price(self, turn: int, price: float) -> None:
+        """
+        :param turn: the turn number
+        :param price: the price of a kWh during this turn
+        """
+        with self.price_shared.get_lock():
+            self.price_shared[self.buffer(turn)] = price
+
+    def get_weather(self, turn: int) -> (int, int):
+        """
+        :param turn: the turn number
+        :return: the temperature and the cloud coverage during this turn
+        """
+        position = 2 * self.buffer(turn)
+        with self.weather_shared.get_lock():
+            return self.weather_shared[position], self.weather_shared[position + 1]
+
+    def set_weather(self, turn: int, temperature: int, cloud_coverage: int) -> None:
+        """
+        :param turn: the turn number
+        :param temperature: the temperature during this turn
+        :param cloud_coverage: the cloud coverage during this turn
+        """
+        position = 2 * self.buffer(turn)
+        with self.weather_shared.get_lock():
+            self.weather_shared[position] = temperature
+            self.weather_shared[position + 1] = cloud_coverage
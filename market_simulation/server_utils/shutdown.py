@@ -0,0 +1,103 @@
+"""
+Shutdown of the simulation, stopping every process at once
+and releasing the IPC objects
+"""
+import os
+import selectors
+import signal
+from time import perf_counter
+
+
+class Shutdown:
+    """
+    Gathers the processes of the simulation in process groups, one per stop signal,
+    so that a single signal stops all of them, however many houses there are :
+    SIGTERM for the processes which can print their last words, and SIGKILL for
+    the houses, which keep no state. The server stays out of the groups, and
+    keeps receiving the terminal signals
+    """
+
+    def __init__(self, timeout: float):
+        self.timeout = timeout  # Time given to the processes to stop, in seconds
+        self.groups = {}  # Process group of the simulation, per stop signal
+        self.processes = []
+        self.ipc_objects = []  # Objects to remove once the processes are stopped
+
+    def adopt(self, processes: list, stop_signal: int = signal.SIGTERM) -> None:
+        """
+        Moves started processes into the process group of their stop signal,
+        the first one becoming its leader
+        :param processes: list of started Process objects
+        :param stop_signal: the signal stopping them
+        """
+        for process in processes:
+            pgid = self.groups.setdefault(stop_signal, process.pid)
+            try:
+                os.setpgid(process.pid, pgid)
+            except ProcessLookupError:
+                pass  # Already stopped, it will be reaped with the others
+            self.processes.append(process)
+
+    def register(self, ipc_object) -> None:
+        """
+        Registers an object to remove once the processes are stopped
+        :param ipc_object: any object with a remove() method
+        """
+        self.ipc_objects.append(ipc_object)
+
+    def stop(self) -> float:
+        """
+        Signals the process groups, reaps the processes and removes the IPC objects
+        :return: the teardown time in seconds
+        """
+        start = perf_counter()
+
+        for stop_signal, pgid in self.groups.items():
+            Shutdown.signal_group(pgid, stop_signal)
+
+        # Reap the processes as they stop, and kill the ones still running after the timeout
+        alive = self.reap(self.processes, start + self.timeout)
+        if alive:
+            for pgid in self.groups.values():
+                Shutdown.signal_group(pgid, signal.SIGKILL)
+            self.reap(alive, perf_counter() + self.timeout)
+
+        for ipc_object in self.ipc_objects:
+            try:
+                ipc_object.remove()
+            except OSError:
+                pass  # Keep removing the other ones
+
+        return perf_counter() - start
+
+    @staticmethod
+    def reap(processes: list, deadline: float) -> list:
+        """
+        Waits for processes to terminate and collects their exit status
+        :param processes: list of Process objects
+        :param deadline: perf_counter value after which to stop waiting
+        :return: the processes still running
+        """
+        alive = {}
+        with selectors.DefaultSelector() as selector:
+            # Register every sentinel once, the selector then only reports the stopped ones
+            for process in processes:
+                selector.register(process.sentinel, selectors.EVENT_READ)
+                alive[process.sentinel] = process
+
+            while alive and (remaining := deadline - perf_counter()) > 0:
+                for key, _ in selector.select(remaining):
+                    selector.unregister(key.fd)
+                    alive.pop(key.fd).join()
+
+        return list(alive.values())
+
+    @staticmethod
+    def signal_group(pgid: int, signal_code: int) -> None:
+        """
+        Sends a signal to every process of a group, if there is any left
+        """
+        try:
+            os.killpg(pgid, signal_code)
+        except ProcessLookupError:
+            pass
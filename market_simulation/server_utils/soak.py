@@ -0,0 +1,82 @@
+"""
+Memory monitoring of long runs : every process records its resident memory
+and turn count, so that the server can check nothing grows turn after turn
+"""
+import os
+import resource
+from multiprocessing import RawArray
+
+PAGE_SIZE = os.sysconf("SC_PAGE_SIZE")
+
+
+def get_rss() -> int:
+    """
+    Resident set size of the calling process
+    :return: the size in bytes
+    """
+    try:
+        with open("/proc/self/statm") as statm:
+            return int(statm.read().split()[1]) * PAGE_SIZE
+    except FileNotFoundError:
+        # No procfs, fall back on the peak resident size, in kB on Linux
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+
+
+class SoakMonitor:
+    """
+    Table in shared memory with one slot per process : (turn, baseline RSS, RSS).
+    Each slot is only written by its process, and read by the server.
+    The baseline is taken at the first report, once the process has warmed up
+    """
+
+    FIELDS = 3
+
+    def __init__(self, nb_slots: int, report_every: int, memory_budget: int):
+        self.report_every = report_every  # Number of turns between two reports
+        self.memory_budget = memory_budget  # Allowed RSS growth of a process, in bytes
+        self.table = RawArray("q", nb_slots * SoakMonitor.FIELDS)
+        self.nb_slots = nb_slots
+
+    def record(self, slot: int, turn: int):
+        """
+        Records the RSS of the calling process, every report_every turns
+        :param slot: the slot of the process
+        :param turn: the number of turns the process went through
+        :return: the RSS growth since the baseline in bytes if recorded, None otherwise
+        """
+        if slot is None or turn == 0 or turn % self.report_every:
+            return None
+
+        position = slot * SoakMonitor.FIELDS
+        rss = get_rss()
+        if not self.table[position + 1]:
+            self.table[position + 1] = rss
+
+        self.table[position] = turn
+        self.table[position + 2] = rss
+        return rss - self.table[position + 1]
+
+    def growth(self, slot: int) -> int:
+        """
+        :param slot: the slot of a process
+        :return: its RSS growth since the baseline, in bytes
+        """
+        position = slot * SoakMonitor.FIELDS
+        return self.table[position + 2] - self.table[position + 1]
+
+    def turn(self, slot: int) -> int:
+        """
+        :param slot: the slot of a process
+        :return: the turn of its last report
+        """
+        return self.table[slot * SoakMonitor.FIELDS]
+
+    def over_budget(self) -> list:
+        """
+        :return: the slots of the processes which grew over the memory budget
+        """
+        return [
+            slot
+            for slot in range(self.nb_slots)
+            if self.growth(slot) > self.memory_budget
+        ]
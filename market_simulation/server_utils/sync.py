@@ -1,12 +1,10 @@
 """
 Defines the class used for server_utils sync
 """
-from time import sleep
-
 from colorama import Back, Fore, Style
 
 from .serverprocess import ServerProcess
-from .sharedvars import SharedVariables
+from .sharedvars import SharedVariables, HISTORY_SIZE, HISTORY_FIELDS
 
 
 class ServerSync(ServerProcess):
@@ -14,35 +12,62 @@ class ServerSync(ServerProcess):
     Class used for server_utils synchronization
     2 modes supported : auto for auto run (time interval)
     and manual, waiting for the user to manually advance in time
+    The turns follow the fixed-rate schedule of the shared variables
     """
 
-    def __init__(self, shared_variables: SharedVariables, time_interval: int):
+    SHEDS_LOGGING = False  # Keeps reporting the overruns
+
+    def __init__(self, shared_variables: SharedVariables):
         super().__init__(shared_variables)
 
-        self.time_interval = time_interval
-        self.turn = 0
+        self.scheduler = shared_variables.scheduler
 
     def update(self):
         """
         Used to sync every other subprocess, waiting the barrier
         when timer expired OR when received the instruction to do so
         """
+        if self.scheduler.deadline is None:
+            self.scheduler.begin()  # The schedule starts with the first turn
+
         print(
             f"\n\n{Back.LIGHTBLUE_EX}{Fore.BLACK}***** Turn {self.turn} ended, "
             f"begin turn {self.turn + 1} *****{Style.RESET_ALL}"
         )
 
-    def write(self):
+        # Record the turn before publishing it, so it is always found in the history
+        self.record()
+
+        with self.shared_variables.turn_shared.get_lock():
+            self.shared_variables.turn_shared.value = self.turn
+
+    def record(self):
         """
-        Used to begin the next turn once all houses have finished their exchanges
+        Records the state the turn starts with in the shared history
         """
-        self.turn += 1
-        sleep(self.time_interval)
-        print("Timer expired, begin next turn")
+        price = self.shared_variables.get_price(self.turn)
+        temperature, cloud_coverage = self.shared_variables.get_weather(self.turn)
 
-    def kill(self) -> None:
+        # The history is a circular buffer, indexed by the turn number
+        position = (self.turn % HISTORY_SIZE) * HISTORY_FIELDS
+        with self.shared_variables.history_shared.get_lock():
+            self.shared_variables.history_shared[
+                position : position + HISTORY_FIELDS
+            ] = [self.turn, price, temperature, cloud_coverage]
+
+    def write(self):
         """
-        Kills softly the process
+        Used to begin the next turn at its deadline, once all houses have finished
+        their exchanges, or right away if the turn overran
         """
-        print(f"{Fore.RED}Stopping sync{Style.RESET_ALL}")
-        super().kill()
+        lateness = self.scheduler.wait()
+        if not lateness:
+            print("Timer expired, begin next turn")
+            return
+
+        overruns, total_lateness, _ = self.scheduler.overruns()
+        print(
+            f"{Fore.RED}Turn {self.turn} overran its deadline by "
+            f"{'{:.1f}'.format(lateness * 1000)} ms ── {overruns} overruns, "
+            f"{'{:.3f}'.format(total_lateness)}s late in total{Style.RESET_ALL}"
+        )
@@ -0,0 +1,92 @@
+"""
+Traces of real data fed to the simulation turn by turn, such as weather series
+or smart-meter profiles, read from memory-mapped binary files
+"""
+import mmap
+import struct
+
+# A trace file starts with a header : magic, number of records per turn and record size
+HEADER = struct.Struct("<8sII")
+MAGIC = b"PPCTRACE"
+
+# Records of the weather trace : temperature and cloud coverage of a turn
+WEATHER_RECORD = struct.Struct("<ii")
+
+# Records of the house trace : consumption and production of a house during a turn
+HOUSE_RECORD = struct.Struct("<dd")
+
+
+class Trace:
+    """
+    Memory-mapped trace file, holding one block of records per turn.
+    Only the pages of the turns about to be simulated are loaded :
+    a single process prefetches the next turns, and each reader drops
+    the pages of the turns it went through from its own mapping.
+    The trace starts again from its beginning once the last turn is reached
+    """
+
+    def __init__(self, path: str, record: struct.Struct, prefetch: int):
+        self.record = record
+        self.prefetch_turns = prefetch  # Number of turns loaded ahead
+
+        with open(path, "rb") as file:
+            self.map = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+
+        magic, self.records_per_turn, record_size = HEADER.unpack_from(self.map)
+        if magic != MAGIC or record_size != record.size:
+            raise ValueError(f"{path} is not a trace of {record.size} bytes records")
+
+        self.block_size = self.records_per_turn * record.size
+        self.nb_turns = (len(self.map) - HEADER.size) // self.block_size
+        if not self.nb_turns:
+            raise ValueError(f"{path} doesn't hold any turn")
+
+        self.map.madvise(mmap.MADV_SEQUENTIAL)
+        self.advise(0, self.prefetch_turns, mmap.MADV_WILLNEED)
+
+    def offset(self, turn: int) -> int:
+        """
+        :param turn: the turn number
+        :return: the position of the block of a turn in the file
+        """
+        return HEADER.size + (turn % self.nb_turns) * self.block_size
+
+    def read(self, turn: int, index: int = 0) -> tuple:
+        """
+        Reads a record, then releases the pages of the previous turn
+        :param turn: the turn number
+        :param index: the index of the record in the block of the turn
+        :return: the fields of the record
+        """
+        fields = self.record.unpack_from(
+            self.map, self.offset(turn) + index * self.record.size
+        )
+        self.advise(turn - 1, 1, mmap.MADV_DONTNEED)
+        return fields
+
+    def prefetch(self, turn: int) -> None:
+        """
+        Asks the kernel to load the turns following a turn in the background
+        :param turn: the turn being simulated
+        """
+        self.advise(turn + 1, self.prefetch_turns, mmap.MADV_WILLNEED)
+
+    def advise(self, turn: int, nb_turns: int, option: int) -> None:
+        """
+        Gives advice to the kernel on the whole pages of consecutive turns
+        :param turn: the first turn
+        :param nb_turns: the number of turns
+        :param option: a mmap.MADV_* constant
+        """
+        if turn < 0:
+            return
+
+        start = self.offset(turn)
+        end = min(start + nb_turns * self.block_size, len(self.map))
+
+        # madvise works on whole pages, leave out the pages shared with other turns
+        start -= start % mmap.PAGESIZE
+        if option == mmap.MADV_DONTNEED:
+            end -= end % mmap.PAGESIZE
+        if end > start:
+            self.map.madvise(option, start, end - start)
@@ -0,0 +1,606 @@
+"""
+Transport layer between the houses and the market
+Several backends are available : SysV message queues, multiprocessing pipes
+and shared-memory ring buffers, plus a loopback within a single process
+"""
+import fcntl
+import resource
+import select
+import struct
+from collections import deque
+from multiprocessing import Array, Pipe, RawArray, Semaphore
+from multiprocessing.connection import wait
+from time import sleep, time
+
+import sysv_ipc
+from colorama import Fore, Style
+
+# Bills are sent back to the house on the type `house pid + REPLY_OFFSET`
+REPLY_OFFSET = 10 ** 6
+
+# Linux fcntl command to get the size of a pipe buffer
+F_GETPIPE_SZ = 1032
+
+# Longest wait between two polls of a full ring buffer, in seconds
+MAX_BACKOFF = 0.001
+
+# Descriptors kept aside for the server, gateway and client besides the pipes
+RESERVED_FDS = 64
+
+# Descriptors held by the server per house : the 4 ends of its pipes, and the 2
+# kept by multiprocessing for the process of the house
+PIPE_FDS_PER_HOUSE = 6
+
+# The market samples the number of pending reports once every this many reports
+HIGH_WATER_SAMPLING = 64
+
+
+class TransportBusy(Exception):
+    """
+    Raised by a non-blocking receive when no message is available
+    """
+
+
+class Transport:
+    """
+    Abstract class defining how houses and the market exchange messages
+    Houses send reports to the market, which sends them back their bill.
+    Every backend keeps backpressure and queue counters shared across processes.
+    The queue counters are written without a lock : each house counts its own
+    reports, and the market alone counts the ones it received
+    """
+
+    backend = "abstract"
+
+    def __init__(self, nb_houses: int = 0):
+        # [number of sends that had to wait, total time spent waiting in seconds]
+        self.backpressure = Array("d", 2)
+        # Reports sent by each house, index 0 is unused as house pids start at 1
+        self.sent = RawArray("q", nb_houses + 1)
+        # [reports received by the market, highest number of pending reports sampled]
+        self.queue = RawArray("q", 2)
+
+    def send_report(self, house: int, message: bytes) -> None:
+        """
+        Sends the report of a house to the market
+        :param house: the pid of the house
+        :param message: the raw report
+        Overridden in sub-class
+        """
+
+    def receive_report(self, block: bool = True) -> (bytes, int):
+        """
+        Receives the report of any house
+        :param block: if False, raise TransportBusy when no report is available
+        :return: the raw report and the pid of the house
+        Overridden in sub-class
+        """
+
+    def send_bill(self, house: int, message: bytes) -> None:
+        """
+        Sends its bill back to a house
+        :param house: the pid of the house
+        :param message: the raw bill
+        Overridden in sub-class
+        """
+
+    def receive_bill(self, house: int, block: bool = True) -> bytes:
+        """
+        Receives the bill of a given house
+        :param house: the pid of the house
+        :param block: if False, raise TransportBusy when no bill is available
+        :return: the raw bill
+        Overridden in sub-class
+        """
+
+    def capacity(self) -> int:
+        """
+        :return: the number of bytes a channel can hold before a send blocks
+        Overridden in sub-class
+        """
+
+    def remove(self) -> None:
+        """
+        Releases the IPC objects used by the transport
+        """
+
+    def attach(self, houses: range = None) -> None:
+        """
+        Releases the channels the calling process doesn't use,
+        once it is started : the ones of the other houses for the process
+        of some houses, the ends of the houses for the market
+        :param houses: the pids of the houses, None for the market
+        """
+
+    def blocked(self, waited: float) -> None:
+        """
+        Records a send that had to wait for room in the channel
+        :param waited: time spent waiting, in seconds
+        """
+        with self.backpressure.get_lock():
+            self.backpressure[0] += 1
+            self.backpressure[1] += waited
+
+    def reported(self, house: int) -> None:
+        """
+        Counts a report about to be sent, before it can be received
+        :param house: the pid of the house, the only one writing its counter
+        """
+        self.sent[house] += 1
+
+    def received(self) -> None:
+        """
+        Counts a report received by the market, sampling the pending reports
+        """
+        if self.queue[0] % HIGH_WATER_SAMPLING == 0:
+            self.queue[1] = max(self.queue[1], self.pending())
+        self.queue[0] += 1
+
+    def pending(self) -> int:
+        """
+        :return: the number of reports waiting to be received by the market
+        """
+        received = self.queue[0]  # Read first, the reports sent only grow
+        return sum(memoryview(self.sent).cast("B").cast("q")) - received
+
+    def stats(self) -> dict:
+        """
+        Capacity, queue and backpressure metrics of the transport
+        :return: a dictionary of metrics, pending reports counted in messages
+        """
+        pending = self.pending()
+        high_water = max(self.queue[1], pending)
+
+        with self.backpressure.get_lock():
+            blocked_sends, blocked_time = self.backpressure
+
+        return {
+            "backend": self.backend,
+            "capacity": self.capacity(),
+            "pending": pending,
+            "high_water": high_water,
+            "blocked_sends": int(blocked_sends),
+            "blocked_time": blocked_time,
+        }
+
+
+class SysVTransport(Transport):
+    """
+    Transport over a single SysV message queue, using message types as addresses.
+    Reports are sent on the house pid, bills on the house pid + REPLY_OFFSET.
+    Also used as is by the server and the client
+    """
+
+    backend = "sysv"
+
+    def __init__(self, ipc_key: int, create: bool = False, nb_houses: int = 0):
+        super().__init__(nb_houses)
+
+        if not create:
+            self.message_queue = sysv_ipc.MessageQueue(ipc_key)
+            return
+
+        # If the queue already exists, remove it using the os primitive and create it again
+        try:
+            self.message_queue = sysv_ipc.MessageQueue(ipc_key, sysv_ipc.IPC_CREX)
+        except sysv_ipc.ExistentialError:
+            print(
+                f"{Fore.BLUE}Message queue {ipc_key} already exists, recreating it.{Style.RESET_ALL}"
+            )
+            sysv_ipc.MessageQueue(ipc_key).remove()
+            self.message_queue = sysv_ipc.MessageQueue(ipc_key, sysv_ipc.IPC_CREX)
+
+    def send(self, message: bytes, message_type: int) -> None:
+        """
+        Sends a message on the queue, recording the time spent if the queue is full
+        :param message: the raw message
+        :param message_type: the message type
+        """
+        try:
+            self.message_queue.send(message, block=False, type=message_type)
+        except sysv_ipc.BusyError:
+            start = time()
+            self.message_queue.send(message, type=message_type)
+            self.blocked(time() - start)
+
+    def receive(self, message_type: int = 0, block: bool = True) -> (bytes, int):
+        """
+        Receives a message from the queue
+        :param message_type: the message type, with the semantics of msgrcv
+        :param block: if False, raise TransportBusy when no message is available
+        :return: the raw message and its type
+        """
+        try:
+            return self.message_queue.receive(block=block, type=message_type)
+        except sysv_ipc.BusyError as error:
+            raise TransportBusy from error
+
+    def send_report(self, house: int, message: bytes) -> None:
+        self.reported(house)
+        self.send(message, house)
+
+    def receive_report(self, block: bool = True) -> (bytes, int):
+        # A negative type only selects reports, never the bills waiting for the houses
+        report = self.receive(-(REPLY_OFFSET - 1), block)
+        self.received()
+        return report
+
+    def send_bill(self, house: int, message: bytes) -> None:
+        self.send(message, house + REPLY_OFFSET)
+
+    def receive_bill(self, house: int, block: bool = True) -> bytes:
+        return self.receive(house + REPLY_OFFSET, block)[0]
+
+    def capacity(self) -> int:
+        return self.message_queue.max_size
+
+    def remove(self) -> None:
+        try:
+            self.message_queue.remove()
+        except sysv_ipc.ExistentialError:
+            pass  # Already removed
+
+
+class PipeTransport(Transport):
+    """
+    Transport using a pair of multiprocessing pipes per house,
+    created before the processes are forked.
+    The server holds the 4 descriptors of each house, and the ones multiprocessing
+    keeps for its process, so the soft limit of open files is raised up to the hard
+    one if needed. The houses and the market close the ends they don't use
+    once started
+    """
+
+    backend = "pipe"
+
+    def __init__(self, nb_houses: int):
+        super().__init__(nb_houses)
+        PipeTransport.reserve_descriptors(PIPE_FDS_PER_HOUSE * nb_houses + RESERVED_FDS)
+
+        # Index 0 is unused, house pids start at 1
+        self.reports = [None] + [Pipe(duplex=False) for _ in range(nb_houses)]
+        self.bills = [None] + [Pipe(duplex=False) for _ in range(nb_houses)]
+
+        self.report_readers = {
+            reader: house for house, (reader, _) in enumerate(self.reports[1:], 1)
+        }
+        self.ready = deque()  # Readers known to hold a report
+
+    @staticmethod
+    def reserve_descriptors(needed: int) -> None:
+        """
+        Makes sure the process can open enough descriptors
+        :param needed: number of descriptors needed
+        """
+        soft, hard = resource.getrlimit(resource.RLIMIT_NOFILE)
+        if soft == resource.RLIM_INFINITY or soft >= needed:
+            return
+        if hard != resource.RLIM_INFINITY and hard < needed:
+            raise ValueError(
+                f"The pipe transport needs {needed} open files, the limit is {hard} :"
+                " raise it with ulimit -n or use another transport"
+            )
+        resource.setrlimit(resource.RLIMIT_NOFILE, (needed, hard))
+
+    def attach(self, houses: range = None) -> None:
+        for pid in range(1, len(self.reports)):
+            if houses is None:  # The market reads the reports and writes the bills
+                self.reports[pid][1].close()
+                self.bills[pid][0].close()
+            elif pid not in houses:
+                for connection in self.reports[pid] + self.bills[pid]:
+                    connection.close()
+            else:  # The house writes its reports and reads its bills
+                self.reports[pid][0].close()
+                self.bills[pid][1].close()
+
+    def send_report(self, house: int, message: bytes) -> None:
+        self.reported(house)
+        self.send(self.reports[house][1], message)
+
+    def receive_report(self, block: bool = True) -> (bytes, int):
+        if not self.ready:
+            self.ready.extend(wait(list(self.report_readers), None if block else 0))
+            if not self.ready:
+                raise TransportBusy
+
+        reader = self.ready.popleft()
+        report = reader.recv_bytes(), self.report_readers[reader]
+        self.received()
+        return report
+
+    def send_bill(self, house: int, message: bytes) -> None:
+        self.send(self.bills[house][1], message)
+
+    def receive_bill(self, house: int, block: bool = True) -> bytes:
+        reader = self.bills[house][0]
+        if not block and not reader.poll():
+            raise TransportBusy
+        return reader.recv_bytes()
+
+    def send(self, writer, message: bytes) -> None:
+        """
+        Writes a message in a pipe, recording the time spent if the pipe is full
+        :param writer: the writing end of the pipe
+        :param message: the raw message
+        """
+        # poll rather than select, which can't watch descriptors above 1024
+        poller = select.poll()
+        poller.register(writer, select.POLLOUT)
+        if poller.poll(0):
+            writer.send_bytes(message)
+        else:
+            start = time()
+            writer.send_bytes(message)
+            self.blocked(time() - start)
+
+    def capacity(self) -> int:
+        return fcntl.fcntl(self.reports[1][0].fileno(), F_GETPIPE_SZ)
+
+    def remove(self) -> None:
+        for pipe in self.reports[1:] + self.bills[1:]:
+            for connection in pipe:
+                connection.close()
+
+
+class RingBuffer:
+    """
+    Lock-free single-producer/single-consumer byte ring buffer in shared memory.
+    Messages are prefixed with their length. The producer only writes the tail
+    counter and the consumer only writes the head counter
+    """
+
+    HEADER = struct.Struct("<I")
+
+    def __init__(self, data: memoryview, counters: memoryview):
+        self.data = data  # Bytes of the ring
+        self.counters = counters  # [head, tail], total bytes read and written
+        self.size = len(data)
+
+    def free(self) -> int:
+        """
+        :return: the number of bytes that can be written without blocking
+        """
+        return self.size - (self.counters[1] - self.counters[0])
+
+    def try_write(self, message: bytes) -> bool:
+        """
+        Writes a message if there is enough room
+        :param message: the raw message
+        :return: True if the message was written, False if the ring is full
+        """
+        length = self.HEADER.size + len(message)
+        if length > self.size:
+            raise ValueError(f"Message of {len(message)} bytes can't fit in the ring")
+        if self.free() < length:
+            return False
+
+        tail = self.counters[1]
+        self.copy_in(tail, self.HEADER.pack(len(message)))
+        self.copy_in(tail + self.HEADER.size, message)
+
+        # Publish the message once it is fully written
+        self.counters[1] = tail + length
+        return True
+
+    def try_read(self):
+        """
+        Reads a message if there is one
+        :return: the raw message, or None if the ring is empty
+        """
+        head = self.counters[0]
+        if self.counters[1] == head:
+            return None
+
+        (length,) = self.HEADER.unpack(self.copy_out(head, self.HEADER.size))
+        message = self.copy_out(head + self.HEADER.size, length)
+
+        # Release the room once the message is fully read
+        self.counters[0] = head + self.HEADER.size + length
+        return message
+
+    def copy_in(self, position: int, chunk: bytes) -> None:
+        """
+        Copies bytes in the ring, wrapping around its end
+        """
+        start = position % self.size
+        first = min(len(chunk), self.size - start)
+        self.data[start : start + first] = chunk[:first]
+        self.data[: len(chunk) - first] = chunk[first:]
+
+    def copy_out(self, position: int, length: int) -> bytes:
+        """
+        Copies bytes out of the ring, wrapping around its end
+        """
+        start = position % self.size
+        first = min(length, self.size - start)
+        return bytes(self.data[start : start + first]) + bytes(
+            self.data[: length - first]
+        )
+
+
+class RingTransport(Transport):
+    """
+    Transport using two shared-memory ring buffers per house,
+    one for its reports and one for its bills.
+    Receivers sleep on a semaphore counting the messages written for them :
+    one for the market for all the reports, and one for the bills of the houses
+    played by the same process, every process mapping each semaphore.
+    Only a sender waiting for room in a full ring polls it, with an exponential backoff
+    """
+
+    backend = "ring"
+
+    def __init__(self, nb_houses: int, ring_capacity: int, groups: list = None):
+        """
+        :param groups: ranges of the pids of the houses played by the same process,
+                       the other houses having a semaphore each
+        """
+        super().__init__(nb_houses)
+        self.nb_houses = nb_houses
+        self.ring_capacity = ring_capacity
+
+        # Rings 0 to nb_houses - 1 carry reports, the next ones carry bills
+        self.data = RawArray("B", 2 * nb_houses * ring_capacity)
+        self.counters = RawArray("q", 4 * nb_houses)
+
+        data = memoryview(self.data).cast("B")
+        counters = memoryview(self.counters).cast("B").cast("q")
+        self.rings = [
+            RingBuffer(
+                data[ring * ring_capacity : (ring + 1) * ring_capacity],
+                counters[2 * ring : 2 * ring + 2],
+            )
+            for ring in range(2 * nb_houses)
+        ]
+
+        # Semaphore counting the bills of each house, index pid - 1
+        self.mailbox = [None] * nb_houses
+        mailboxes = 0
+        for group in groups or []:
+            for house in group:
+                self.mailbox[house - 1] = mailboxes
+            mailboxes += 1
+        for row, mailbox in enumerate(self.mailbox):
+            if mailbox is None:
+                self.mailbox[row] = mailboxes
+                mailboxes += 1
+
+        # Released once per message written : reports for the market, bills per group
+        self.reports_ready = Semaphore(0)
+        self.bills_ready = [Semaphore(0) for _ in range(mailboxes)]
+        # Counts taken by the process for the bills of other houses of their group
+        self.credits = [0] * mailboxes
+
+        self.cursor = 0  # Next report ring read by the market
+
+    def send_report(self, house: int, message: bytes) -> None:
+        self.reported(house)
+        self.send(self.rings[house - 1], message)
+        self.reports_ready.release()
+
+    def receive_report(self, block: bool = True) -> (bytes, int):
+        if not self.reports_ready.acquire(block):
+            raise TransportBusy
+
+        # A report was written, look for it starting after the last ring read
+        while True:
+            ring = self.cursor
+            self.cursor = (self.cursor + 1) % self.nb_houses
+            message = self.rings[ring].try_read()
+            if message is not None:
+                self.received()
+                return message, ring + 1
+
+    def send_bill(self, house: int, message: bytes) -> None:
+        self.send(self.rings[self.nb_houses + house - 1], message)
+        self.bills_ready[self.mailbox[house - 1]].release()
+
+    def receive_bill(self, house: int, block: bool = True) -> bytes:
+        mailbox = self.mailbox[house - 1]
+        ring = self.rings[self.nb_houses + house - 1]
+
+        # A count taken while waiting may be the one of the bill of another house
+        # of the group : it is kept for that bill
+        while (message := ring.try_read()) is None:
+            if not self.bills_ready[mailbox].acquire(block):
+                raise TransportBusy
+            self.credits[mailbox] += 1
+
+        if self.credits[mailbox]:
+            self.credits[mailbox] -= 1
+        else:
+            self.bills_ready[
+                mailbox
+            ].acquire()  # Released right after the bill is written
+        return message
+
+    def send(self, ring: RingBuffer, message: bytes) -> None:
+        """
+        Writes a message in a ring, recording the time spent if the ring is full
+        :param ring: the ring of the receiver
+        :param message: the raw message
+        """
+        if ring.try_write(message):
+            return
+
+        start = time()
+        backoff = 0
+        while not ring.try_write(message):
+            backoff = RingTransport.wait(backoff)
+        self.blocked(time() - start)
+
+    @staticmethod
+    def wait(backoff: float) -> float:
+        """
+        Sleeps before polling a full ring again
+        :param backoff: the previous waiting time
+        :return: the next waiting time
+        """
+        sleep(backoff)
+        return min(MAX_BACKOFF, backoff * 2 or 0.00001)
+
+    def capacity(self) -> int:
+        return self.ring_capacity
+
+
+class LoopbackTransport(Transport):
+    """
+    Transport within a single process, when the houses and the market
+    are played one after the other, as in the branches of a forked simulation
+    """
+
+    backend = "loopback"
+
+    def __init__(self, nb_houses: int):
+        super().__init__(nb_houses)
+        self.reports = deque()
+        self.bills = {}  # Bills waiting to be received, per house
+
+    def send_report(self, house: int, message: bytes) -> None:
+        self.reported(house)
+        self.reports.append((message, house))
+
+    def receive_report(self, block: bool = True) -> (bytes, int):
+        if not self.reports:
+            raise TransportBusy  # Nobody else could send it
+        self.received()
+        return self.reports.popleft()
+
+    def send_bill(self, house: int, message: bytes) -> None:
+        self.bills.setdefault(house, deque()).append(message)
+
+    def receive_bill(self, house: int, block: bool = True) -> bytes:
+        if not self.bills.get(house):
+            raise TransportBusy
+        return self.bills[house].popleft()
+
+    def capacity(self) -> int:
+        return 0  # Unbounded
+
+
+def get_transport(
+    backend: str,
+    ipc_key: int,
+    nb_houses: int,
+    ring_capacity: int,
+    groups: list = None,
+) -> Transport:
+    """
+    Creates the transport between the houses and the market
+    :param backend: "sysv", "pipe" or "ring"
+    :param ipc_key: the IPC message queue key, used by the sysv backend
+    :param nb_houses: number of houses, used by the pipe and ring backends
+    :param ring_capacity: size in bytes of each ring, used by the ring backend
+    :param groups: ranges of the pids of the houses played by the same process,
+                   used by the ring backend
+    :return: the Transport object
+    """
+    if backend == "sysv":
+        return SysVTransport(ipc_key, create=True, nb_houses=nb_houses)
+    if backend == "pipe":
+        return PipeTransport(nb_houses)
+    if backend == "ring":
+        return RingTransport(nb_houses, ring_capacity, groups)
+
+    raise ValueError(f"Unknown transport backend {backend}")
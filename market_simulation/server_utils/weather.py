@@ -7,32 +7,37 @@ from random import randint
 from colorama import Fore, Style
 
 from .serverprocess import ServerProcess
+from .sharedvars import SharedVariables
+from .trace import Trace
 
 
 class Weather(ServerProcess):
     """
     Object used to update the weather of the simulation
-    weather_shared array : weather_shared[0] -> temperature ; weather_shared[1] -> cloud_coverage
+    Writes the weather of the next turn in the shared memory,
+    either random or replayed from a trace
     """
 
+    def __init__(self, shared_variables: SharedVariables, trace: Trace = None):
+        super().__init__(shared_variables)
+        self.trace = trace
+
     def write(self):
         """
         Update weather conditions
         """
-        with self.shared_variables.weather_shared.get_lock():
-            self.shared_variables.weather_shared[0] += randint(-5, 5)  # Temperature
-            self.shared_variables.weather_shared[0] = max(
-                min(40, self.shared_variables.weather_shared[0]), -15
-            )  # Stays in the interval [-15, 40]
-            self.shared_variables.weather_shared[1] = randint(1, 100)  # Cloud coverage
-            print(
-                f"{Fore.YELLOW}Weather for next turn : {self.shared_variables.weather_shared[0]}°C, "
-                f"Cloud coverage {self.shared_variables.weather_shared[1]}%{Style.RESET_ALL}\n"
-            )
-
-    def kill(self) -> None:
-        """
-        Kills softly the process
-        """
-        print(f"{Fore.RED}Stopping weather{Style.RESET_ALL}")
-        super().kill()
+        if self.trace:
+            self.trace.prefetch(self.turn + 1)
+            temperature, cloud_coverage = self.trace.read(self.turn + 1)
+        else:
+            temperature, cloud_coverage = self.shared_variables.get_weather(self.turn)
+
+            temperature += randint(-5, 5)
+            temperature = max(min(40, temperature), -15)  # Stays in [-15, 40]
+            cloud_coverage = randint(1, 100)
+
+        self.shared_variables.set_weather(self.turn + 1, temperature, cloud_coverage)
+        print(
+            f"{Fore.YELLOW}Weather for next turn : {temperature}°C, "
+            f"Cloud coverage {cloud_coverage}%{Style.RESET_ALL}\n"
+        )
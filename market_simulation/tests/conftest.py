@@ -0,0 +1,74 @@
+"""
+Makes the simulation modules importable from the tests,
+and builds markets whose external factors aren't started
+"""
+import os
+import signal
+import sys
+from array import array
+from multiprocessing import Array, Barrier, Value
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# pylint: disable=wrong-import-position
+from server_utils import market as market_module
+from server_utils.housetable import HouseTable
+from server_utils.market import Market
+from server_utils.sharedvars import SharedVariables
+from server_utils.transport import LoopbackTransport
+
+
+@pytest.fixture(name="started")
+def fixture_started(monkeypatch):
+    """
+    Records the signal handlers installed when each external factor is started,
+    instead of starting it
+    """
+    handlers = signal.getsignal(signal.SIGUSR1), signal.getsignal(signal.SIGUSR2)
+    started = []
+    monkeypatch.setattr(
+        market_module.ExternalFactor,
+        "start",
+        lambda factor: started.append((factor, signal.getsignal(factor.signal_code))),
+    )
+    yield started
+    signal.signal(signal.SIGUSR1, handlers[0])
+    signal.signal(signal.SIGUSR2, handlers[1])
+
+
+@pytest.fixture(name="make_market")
+def fixture_make_market(started):  # pylint: disable=unused-argument
+    """
+    :return: a function building a Market over a loopback transport
+    """
+
+    def make_market(
+        types: list, time_interval: float = 1, price: float = 0.5
+    ) -> Market:
+        """
+        :param types: the type of every house
+        :param time_interval: the period of the turns
+        :param price: the price of a kWh
+        :return: the Market
+        """
+        shared_variables = SharedVariables(
+            compute_barrier=Barrier(1),
+            write_barrier=Barrier(1),
+            price_shared=Array("d", [price] * 2),
+            weather_shared=Array("i", [20, 10] * 2),
+            turn_shared=Value("i"),
+            history_shared=Array("d", 4),
+        )
+        table = HouseTable(array("b", types), array("d", [0]) * len(types), 0)
+        return Market(
+            shared_variables=shared_variables,
+            politics=100,
+            economy=100,
+            table=table,
+            transport=LoopbackTransport(len(types)),
+            time_interval=time_interval,
+        )
+
+    return make_market
@@ -0,0 +1,62 @@
+"""
+Tests of the aggregates kept by the market
+"""
+from server_utils.aggregates import Aggregates
+
+
+def test_nothing_published():
+    aggregates = Aggregates(top_k=3)
+    assert aggregates.ranking() == (-1, [], [])
+    assert aggregates.energy() == (-1, 0, 0)
+
+
+def test_top_k():
+    aggregates = Aggregates(top_k=3)
+    consumptions = [5, -40, 12, 3, -2, 30, -7, 8, -90, 1]
+    for house, consumption in enumerate(consumptions, 1):
+        aggregates.add_report(house, 1 + house % 3, consumption)
+    aggregates.publish(4)
+
+    turn, consumers, producers = aggregates.ranking()
+    assert turn == 4
+    assert consumers == [(6, 30), (3, 12), (8, 8)]
+    assert producers == [(9, 90), (2, 40), (7, 7)]
+
+
+def test_top_k_partial_ranking():
+    aggregates = Aggregates(top_k=3)
+    aggregates.add_report(1, 1, 10)
+    aggregates.add_report(2, 2, -4)
+    aggregates.publish(0)
+
+    assert aggregates.ranking() == (0, [(1, 10)], [(2, 4)])
+
+
+def test_by_type_and_energy():
+    aggregates = Aggregates(top_k=2)
+    aggregates.add_report(1, 1, -10)
+    aggregates.add_report(2, 1, 6)
+    aggregates.add_report(3, 3, -4)
+    aggregates.add_bill(1, 1.5)
+    aggregates.add_bill(3, -0.5)
+    aggregates.add_given(10)
+    aggregates.add_sold(4)
+    aggregates.publish(7)
+
+    turn, types = aggregates.by_type()
+    assert turn == 7
+    assert types == {1: (2, -4, 1.5), 2: (0, 0, 0), 3: (1, -4, -0.5)}
+    assert aggregates.energy() == (7, 10, 4)
+
+
+def test_publish_starts_a_new_turn():
+    aggregates = Aggregates(top_k=2)
+    aggregates.add_report(1, 2, 50)
+    aggregates.add_given(3)
+    aggregates.publish(1)
+    aggregates.add_report(2, 2, 1)
+    aggregates.publish(2)
+
+    assert aggregates.ranking() == (2, [(2, 1)], [])
+    assert aggregates.energy() == (2, 0, 0)
+    assert aggregates.by_type()[1][2] == (1, 1, 0)
@@ -0,0 +1,103 @@
+"""
+Tests of the streaming statistics
+"""
+import math
+import random
+import statistics
+
+import pytest
+
+from server_utils.analytics import Analytics, Series, Sketch
+
+
+def test_series_window():
+    series = Series(window=10, weight=0.1)
+    generator = random.Random(1)
+    values = [generator.uniform(-50, 50) for _ in range(35)]
+    for value in values:
+        series.add(value)
+
+    summary = series.summary()
+    assert summary["count"] == 35
+    assert summary["mean"] == pytest.approx(statistics.mean(values[-10:]))
+    assert summary["std"] == pytest.approx(statistics.stdev(values[-10:]))
+
+
+def test_series_ewma():
+    series = Series(window=5, weight=0.5)
+    for value in (4, 8, 0):
+        series.add(value)
+
+    summary = series.summary()
+    assert summary["ewma"] == pytest.approx(3)  # 4, then 6, then 3
+    assert summary["ew_std"] > 0
+
+
+def test_series_empty():
+    summary = Series(window=5, weight=0.5).summary()
+    assert summary["count"] == 0
+    assert summary["std"] == 0
+
+
+def test_sketch_quantiles():
+    sketch = Sketch(accuracy=0.01, min_value=0.001, max_value=1e6)
+    generator = random.Random(2)
+    values = sorted(generator.uniform(-100, 1000) for _ in range(10000))
+    for value in values:
+        sketch.add(value)
+
+    count, quantiles = sketch.quantiles((0.01, 0.5, 0.9, 0.99))
+    assert count == 10000
+    for quantile, estimate in zip((0.01, 0.5, 0.9, 0.99), quantiles):
+        exact = values[int(quantile * (len(values) - 1))]
+        assert estimate == pytest.approx(exact, rel=0.011)
+
+
+def test_sketch_zero_bucket():
+    sketch = Sketch(accuracy=0.01, min_value=0.001, max_value=1e6)
+    for value in (0, 0.0001, -0.0001, 5):
+        sketch.add(value)
+    assert sketch.quantiles((0.5,)) == (4, [0.0])
+
+
+def test_sketch_empty():
+    count, quantiles = Sketch(0.01, 0.001, 1e6).quantiles((0.5, 0.99))
+    assert count == 0
+    assert all(math.isnan(value) for value in quantiles)
+
+
+def test_sketch_merge_and_dump():
+    first = Sketch(0.01, 0.001, 1e6)
+    second = Sketch(0.01, 0.001, 1e6)
+    whole = Sketch(0.01, 0.001, 1e6)
+    for value in range(1, 1001):
+        (first if value % 2 else second).add(value)
+        whole.add(value)
+
+    merged = Sketch.load(first.dump())
+    assert merged.compatible(second)
+    merged.merge(second.shared[:])
+    assert merged.quantiles() == whole.quantiles()
+
+
+def test_sketch_incompatible():
+    sketch = Sketch(0.01, 0.001, 1e6)
+    other = Sketch(0.02, 0.001, 1e6)
+    assert not sketch.compatible(other)
+    assert not sketch.compatible(Sketch(0.01, 0.001, 1e9))
+    with pytest.raises(ValueError):
+        sketch.merge(other.shared[:])
+
+
+def test_analytics_turns():
+    analytics = Analytics(window=3)
+    for turn in range(4):
+        for consumption in (10, -4, 6):
+            analytics.add_report(consumption + turn)
+        analytics.end_turn(price=0.1 * (turn + 1))
+
+    dump = analytics.dump()
+    assert dump["series"]["consumption"]["count"] == 4
+    assert dump["series"]["consumption"]["mean"] == pytest.approx(18)  # 15, 18, 21
+    assert dump["series"]["price"]["mean"] == pytest.approx(0.3)
+    assert analytics.empty_copy().dump()["series"]["price"]["count"] == 0
@@ -0,0 +1,45 @@
+"""
+Tests of the what-if branches, played in the test process
+"""
+import pytest
+
+from server_utils.branch import Branch
+from server_utils.weather import Weather
+
+
+def make_branch(market, scenario: dict) -> Branch:
+    """
+    :param market: the market of the simulation
+    :param scenario: the scenario of the branch
+    :return: a Branch starting from turn 1 with a weather of 20°C and 10% cloud coverage
+    """
+    return Branch(
+        scenario=scenario,
+        state={
+            "turn": 1,
+            "price": 0.5,
+            "weather": (20, 10),
+            "politics": 100,
+            "economy": 100,
+            "consumption": 0,
+            "productions": [0] * market.table.size,
+            "seed": 0,
+        },
+        market=market,
+        weather=Weather(market.shared_variables),
+        table=market.table,
+    )
+
+
+def test_weather_from_the_first_turn(make_market):
+    branch = make_branch(make_market([1, 2]), {"weather": {"temperature": -10}})
+    assert branch.shared_variables.get_weather(1) == (-10, 10)
+
+    branch.play()
+    assert branch.shared_variables.get_weather(2)[0] == -10
+
+
+def test_weather_not_overridden(make_market):
+    branch = make_branch(make_market([1]), {"market": {"gamma": 0.5}})
+    assert branch.shared_variables.get_weather(1) == (20, 10)
+    assert branch.market.gamma == pytest.approx(0.5)
@@ -0,0 +1,35 @@
+"""
+Tests of the formatting of the server responses by the client
+"""
+from client import Client
+
+
+def test_report_by_default():
+    assert Client.process("report", "0.15;25;20") == (
+        "Price of kWh : 0.15€/kWh ── Temperature : 25°C ── Cloud coverage : 20%"
+    )
+
+
+def test_server_errors():
+    assert Client.process("types", "error") == "Server couldn't process the request"
+    assert Client.process("report", "end").startswith("Server terminated")
+
+
+def test_no_turn_settled():
+    for request in ("types", "top", "energy"):
+        assert Client.process(request, "-1") == "No turn settled yet"
+
+
+def test_settled_turn():
+    assert Client.process("energy", "3;1.50;2.00") == (
+        "Turn 3 ── Given away : 1.50 kWh ── Sold : 2.00 kWh"
+    )
+    assert Client.process("top", "3;2,5.00;") == (
+        "Turn 3\n   Consumers : house 2 (5.00 kWh)\n   Producers : none"
+    )
+
+
+def test_fork_with_its_argument():
+    lines = Client.process("fork 1", "4;baseline,6,0.2,0.1,10,2,100,90").split("\n")
+    assert lines[0] == "Branches forked at turn 4"
+    assert lines[1].strip().startswith("baseline : turn 6")
@@ -0,0 +1,83 @@
+"""
+Tests of the gateway standing in for the remote houses, and of its configuration
+"""
+import asyncio
+import json
+from array import array
+from multiprocessing import Array, Barrier, Value
+from pathlib import Path
+
+import pytest
+
+from server import Server
+from server_utils.gateway import Gateway
+from server_utils.housetable import HouseTable
+from server_utils.sharedvars import SharedVariables
+from server_utils.transport import LoopbackTransport
+
+
+def make_gateway(house_timeout: float) -> Gateway:
+    """
+    :param house_timeout: the time given to the remote houses
+    :return: a Gateway for 1 local and 2 remote houses, over a loopback transport
+    """
+    shared_variables = SharedVariables(
+        compute_barrier=Barrier(1),
+        write_barrier=Barrier(1),
+        price_shared=Array("d", 2),
+        weather_shared=Array("i", 4),
+        turn_shared=Value("i", 3),
+        history_shared=Array("d", 4),
+    )
+    return Gateway(
+        host="127.0.0.1",
+        port=0,
+        handler=str,
+        transport=LoopbackTransport(3),
+        shared_variables=shared_variables,
+        table=HouseTable(array("b", [1]), array("d", [0]), 0, remote_houses=2),
+        remote_houses=range(2, 4),
+        house_timeout=house_timeout,
+    )
+
+
+def test_stand_in_for_missing_houses():
+    gateway = make_gateway(house_timeout=0.05)
+
+    async def turn() -> str:
+        # House 3 reports, house 2 never connects
+        collector = asyncio.ensure_future(gateway.collect_bills())
+        watcher = asyncio.ensure_future(gateway.watch_turns())
+        report = asyncio.ensure_future(gateway.house(3, 2, 12.5))
+        await asyncio.sleep(0.2)
+
+        # The market settles both reports
+        for _ in range(2):
+            message, house = gateway.transport.receive_report()
+            gateway.transport.send_bill(house, message)
+        bill = await report
+        await asyncio.sleep(0.05)
+        collector.cancel()
+        watcher.cancel()
+        return bill
+
+    assert asyncio.run(turn()) == "12.5"
+    assert gateway.last_turn == {2: 3, 3: 3}
+    assert gateway.bills == {}  # The bill of the stood in house was collected
+
+
+def test_stand_in_disabled():
+    gateway = make_gateway(house_timeout=0)
+    asyncio.run(asyncio.wait_for(gateway.watch_turns(), 1))
+    assert gateway.transport.pending() == 0
+
+
+def test_remote_houses_need_the_gateway(tmp_path):
+    config = json.loads((Path(__file__).parent.parent / "config.json").read_text())
+    config["cities"]["remote_houses"] = 2
+    config["gateway"]["enabled"] = False
+    path = tmp_path / "config.json"
+    path.write_text(json.dumps(config))
+
+    with pytest.raises(ValueError, match="gateway"):
+        Server(str(path))
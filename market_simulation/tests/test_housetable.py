@@ -0,0 +1,68 @@
+"""
+Tests of the house table
+"""
+from array import array
+
+import pytest
+
+from server_utils.housetable import HouseTable
+
+
+def write_houses(tmp_path, lines: str) -> str:
+    """
+    :param lines: content of the houses file
+    :return: the path of the file
+    """
+    path = tmp_path / "houses.csv"
+    path.write_text(lines)
+    return str(path)
+
+
+def test_load(tmp_path):
+    path = write_houses(tmp_path, "1,120\n3, 45.5\n\n2,0\n")
+    table = HouseTable.load(path, average_conso=15, remote_houses=2)
+
+    assert (table.local_houses, table.size) == (3, 5)
+    assert list(table.types) == [1, 3, 2, 0, 0]
+    assert list(table.base_productions) == [120, 45.5, 0, 0, 0]
+    assert list(table.productions) == list(table.base_productions)
+    assert list(table.consumptions) == [15] * 5
+    assert list(table.bills) == [0] * 5
+
+
+@pytest.mark.parametrize(
+    "lines, line",
+    [
+        ("1,120\n4,10\n", 2),  # Unknown type
+        ("1,120\n2,lots\n", 2),  # Production isn't a number
+        ("1\n", 1),  # Missing production
+        ("1,120\n2,10,3\n", 2),  # Extra field
+    ],
+)
+def test_load_errors(tmp_path, lines, line):
+    path = write_houses(tmp_path, lines)
+    with pytest.raises(ValueError, match=f"Line {line} of "):
+        HouseTable.load(path, average_conso=15)
+
+
+def test_generate():
+    table = HouseTable.generate(100, average_conso=15, max_prod=200, remote_houses=1)
+    assert (table.local_houses, table.size) == (100, 101)
+    assert set(table.types[:100]) <= {1, 2, 3}
+    assert table.types[100] == 0
+    assert all(0 <= production < 200 for production in table.base_productions)
+
+
+def test_copy_is_private():
+    table = HouseTable(array("b", [1, 2]), array("d", [10, 20]), 15, remote_houses=1)
+    table.productions[1] = 25
+    copy = table.copy()
+
+    assert copy.size == 2  # Only the local houses
+    assert list(copy.types) == [1, 2]
+    assert list(copy.productions) == [10, 25]
+
+    copy.productions[0] = 0
+    copy.bills[1] = 3
+    assert table.productions[0] == 10
+    assert table.bills[1] == 0
@@ -0,0 +1,67 @@
+"""
+Tests of the market, with external factors that aren't started
+"""
+import pytest
+
+from server_utils.market import MIN_FACTOR_PERIOD
+
+
+def test_signals_handled_before_the_factors_start(started, make_market):
+    market = make_market([1])
+    assert [handler for _, handler in started] == [market.signal_handler] * 2
+
+
+def test_null_interval_spaces_the_factors(started, make_market):
+    make_market([1], time_interval=0)
+    assert [factor.delay for factor, _ in started] == [
+        MIN_FACTOR_PERIOD * 7,
+        MIN_FACTOR_PERIOD * 6,
+    ]
+
+
+def bills(market) -> dict:
+    """
+    :param market: a market over a loopback transport
+    :return: the bills sent to each house, in order
+    """
+    return {
+        house: [float(bill) for bill in queue]
+        for house, queue in market.transport.bills.items()
+    }
+
+
+def test_waiting_surplus_partly_taken(make_market):
+    # House 1 puts 10 kWh on the giveaway queue, house 2 takes 4 of them
+    market = make_market([3, 1], price=0.5)
+    market.transaction(b"-10", 1)
+    market.transaction(b"4", 2)
+    assert bills(market) == {2: [0]}
+    assert list(market.waiting_houses) == [(1, pytest.approx(6))]
+
+    # Nobody took the rest : the market buys it
+    market.settle_waiting()
+    assert bills(market) == {2: [0], 1: [pytest.approx(-3)]}
+    assert list(market.table.bills) == [pytest.approx(-3), 0]
+    assert not market.waiting_houses
+    assert market.aggregates.energy() == (0, pytest.approx(4), pytest.approx(6))
+
+
+def test_waiting_surplus_fully_taken(make_market):
+    # House 2 takes the 3 kWh of house 1 for free, and pays for the 2 others
+    market = make_market([3, 1], price=0.5)
+    market.transaction(b"-3", 1)
+    market.transaction(b"5", 2)
+    market.settle_waiting()
+    assert bills(market) == {1: [0], 2: [pytest.approx(1)]}
+    assert market.aggregates.energy() == (0, pytest.approx(3), 0)
+
+
+def test_given_surplus_taken(make_market):
+    # House 1 gives 10 kWh away, house 2 consumes 4 of them and house 3 the 6 others
+    market = make_market([1, 2, 2], price=0.5)
+    market.transaction(b"-10", 1)
+    market.transaction(b"4", 2)
+    market.transaction(b"8", 3)
+    market.settle_waiting()
+    assert bills(market) == {1: [0], 2: [0], 3: [pytest.approx(1)]}
+    assert market.surplus.value == 0
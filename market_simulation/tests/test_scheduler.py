@@ -0,0 +1,140 @@
+"""
+Tests of the turn schedule, on a simulated clock
+"""
+import threading
+import time
+
+import pytest
+
+from server_utils import scheduler as scheduler_module
+from server_utils.scheduler import Scheduler
+
+
+class Clock:
+    """
+    Monotonic clock only moved by the test, and by the sleeps of the scheduler
+    """
+
+    def __init__(self):
+        self.now = 0.0
+
+    def monotonic(self) -> float:
+        return self.now
+
+    def sleep(self, duration: float) -> None:
+        self.now += duration
+
+
+@pytest.fixture(name="clock")
+def fixture_clock(monkeypatch):
+    clock = Clock()
+    monkeypatch.setattr(scheduler_module, "monotonic", clock.monotonic)
+    monkeypatch.setattr(scheduler_module, "sleep", clock.sleep)
+    return clock
+
+
+def test_on_time(clock):
+    scheduler = Scheduler(interval=1, policy="catch_up", shed_logging=True)
+    scheduler.begin()
+    for turn in range(1, 4):
+        clock.now += 0.2  # The turn takes less than its period
+        assert scheduler.wait() == 0
+        assert clock.now == pytest.approx(turn)
+    assert scheduler.overruns() == (0, 0, 0)
+    assert not scheduler.shedding()
+
+
+def test_catch_up(clock):
+    scheduler = Scheduler(interval=1, policy="catch_up", shed_logging=True)
+    scheduler.begin()
+
+    clock.now = 2.5
+    assert scheduler.wait() == pytest.approx(1.5)
+    assert scheduler.shedding()
+
+    # The deadlines are kept : the next turn is late too, the one after is on time
+    clock.now = 2.6
+    assert scheduler.wait() == pytest.approx(0.6)
+    clock.now = 2.7
+    assert scheduler.wait() == 0
+    assert clock.now == pytest.approx(3)
+    assert not scheduler.shedding()
+
+    overruns, lateness, max_lateness = scheduler.overruns()
+    assert overruns == 2
+    assert lateness == pytest.approx(2.1)
+    assert max_lateness == pytest.approx(1.5)
+
+
+def test_skip(clock):
+    scheduler = Scheduler(interval=1, policy="skip", shed_logging=False)
+    scheduler.begin()
+
+    clock.now = 2.5
+    assert scheduler.wait() == pytest.approx(1.5)
+    assert not scheduler.shedding()  # Logging is only shed if enabled
+
+    # The schedule starts over from the late turn
+    clock.now = 2.6
+    assert scheduler.wait() == 0
+    assert clock.now == pytest.approx(3.5)
+
+    overruns, lateness, _ = scheduler.overruns()
+    assert overruns == 1
+    assert lateness == pytest.approx(1.5)
+
+
+def test_null_interval(clock):
+    scheduler = Scheduler(interval=0, policy="catch_up", shed_logging=True)
+    scheduler.begin()
+    clock.now = 5
+    assert scheduler.wait() == 0
+    assert scheduler.overruns() == (0, 0, 0)
+
+
+def test_unknown_policy():
+    with pytest.raises(ValueError):
+        Scheduler(interval=1, policy="drop", shed_logging=False)
+
+
+def test_negative_interval():
+    with pytest.raises(ValueError):
+        Scheduler(interval=-1, policy="catch_up", shed_logging=False)
+
+
+def test_hold_times_out():
+    scheduler = Scheduler(interval=1, policy="catch_up", shed_logging=False)
+    assert not scheduler.hold(timeout=0.01)
+    assert scheduler.running.is_set()  # The turn goes on
+
+
+def test_hold_at_checkpoint():
+    scheduler = Scheduler(interval=1, policy="catch_up", shed_logging=False)
+    scheduler.checkpoint()  # Nobody asked for a hold, returns at once
+
+    # Two processes end their turn on the barrier, the second one a bit later
+    barrier = threading.Barrier(2, action=scheduler.checkpoint)
+    first = threading.Thread(target=barrier.wait)
+    last = threading.Timer(0.05, barrier.wait)
+    first.start()
+    last.start()
+    assert scheduler.hold(timeout=1)
+
+    time.sleep(0.05)
+    assert first.is_alive() and last.is_alive()  # Held at the barrier
+
+    scheduler.release()
+    first.join(1)
+    last.join(1)
+    assert not first.is_alive() and not last.is_alive()
+    assert not scheduler.held.is_set()
+    assert scheduler.stats[4] > 0  # Time held
+
+
+def test_held_time_is_not_late(clock):
+    scheduler = Scheduler(interval=1, policy="catch_up", shed_logging=False)
+    scheduler.begin()
+    scheduler.stats[4] = 3  # Held for 3 seconds during the turn
+    clock.now = 3.5
+    assert scheduler.wait() == 0
+    assert clock.now == pytest.approx(4)
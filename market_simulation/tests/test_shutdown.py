@@ -0,0 +1,58 @@
+"""
+Tests of the shutdown of the simulation processes
+"""
+import signal
+import time
+from multiprocessing import Process
+
+from server_utils.shutdown import Shutdown
+
+
+def stubborn() -> None:
+    """
+    Process ignoring SIGTERM
+    """
+    signal.signal(signal.SIGTERM, signal.SIG_IGN)
+    time.sleep(60)
+
+
+def test_stop_signals_every_group():
+    shutdown = Shutdown(timeout=5)
+    houses = [Process(target=stubborn) for _ in range(3)]
+    others = [Process(target=time.sleep, args=(60,)) for _ in range(2)]
+    for process in houses + others:
+        process.start()
+    time.sleep(0.2)  # Let the houses ignore SIGTERM
+
+    shutdown.adopt(houses, signal.SIGKILL)
+    shutdown.adopt(others)
+    teardown = shutdown.stop()
+
+    assert teardown < 1  # Nothing waited for the timeout
+    assert [process.exitcode for process in houses] == [-signal.SIGKILL] * 3
+    assert [process.exitcode for process in others] == [-signal.SIGTERM] * 2
+
+
+def test_stop_kills_after_the_timeout():
+    shutdown = Shutdown(timeout=0.2)
+    process = Process(target=stubborn)
+    process.start()
+    time.sleep(0.2)
+
+    shutdown.adopt([process])
+    assert shutdown.stop() >= 0.2
+    assert process.exitcode == -signal.SIGKILL
+
+
+def test_stop_removes_ipc_objects():
+    class Queue:
+        removed = False
+
+        def remove(self):
+            self.removed = True
+
+    shutdown = Shutdown(timeout=1)
+    queue = Queue()
+    shutdown.register(queue)
+    shutdown.stop()
+    assert queue.removed
@@ -0,0 +1,171 @@
+"""
+Tests of the transports between the houses and the market
+"""
+import resource
+from multiprocessing import Process
+
+import pytest
+
+from server_utils.transport import (
+    HIGH_WATER_SAMPLING,
+    PIPE_FDS_PER_HOUSE,
+    LoopbackTransport,
+    PipeTransport,
+    RingBuffer,
+    RingTransport,
+    TransportBusy,
+)
+
+
+def make_ring(size: int) -> RingBuffer:
+    """
+    :param size: number of bytes of the ring
+    :return: a RingBuffer in private memory
+    """
+    return RingBuffer(memoryview(bytearray(size)), memoryview(bytearray(16)).cast("q"))
+
+
+def test_ring_wraps_around():
+    ring = make_ring(16)
+
+    # Each message takes 4 bytes of header, so the third one crosses the end
+    for message in (b"abcdef", b"ghij", b"klmnop", b"qr"):
+        assert ring.try_write(message)
+        assert ring.try_read() == message
+    assert ring.counters[1] > ring.size
+    assert ring.try_read() is None
+
+
+def test_ring_full():
+    ring = make_ring(16)
+    assert ring.try_write(b"12345678")
+    assert not ring.try_write(b"1234")  # 4 bytes left, 8 needed
+    assert ring.try_read() == b"12345678"
+    assert ring.try_write(b"1234")
+
+
+def test_ring_oversize_message():
+    ring = make_ring(16)
+    with pytest.raises(ValueError):
+        ring.try_write(b"x" * 13)
+    assert ring.try_write(b"x" * 12)
+
+
+def test_ring_transport_exchange():
+    transport = RingTransport(nb_houses=3, ring_capacity=32)
+    with pytest.raises(TransportBusy):
+        transport.receive_report(block=False)
+
+    for house in (2, 3, 1):
+        transport.send_report(house, f"1;{house}".encode())
+    reports = {transport.receive_report()[1] for _ in range(3)}
+    assert reports == {1, 2, 3}
+
+    transport.send_bill(2, b"4.5")
+    assert transport.receive_bill(2) == b"4.5"
+    with pytest.raises(TransportBusy):
+        transport.receive_bill(1, block=False)
+
+
+@pytest.mark.parametrize(
+    "transport",
+    [LoopbackTransport(4), PipeTransport(4), RingTransport(4, 64)],
+    ids=["loopback", "pipe", "ring"],
+)
+def test_pending_and_high_water(transport):
+    for house in range(1, 5):
+        transport.send_report(house, b"1;10")
+    transport.receive_report()
+
+    stats = transport.stats()
+    assert stats["pending"] == 3
+    assert stats["high_water"] == 4
+
+    for _ in range(3):
+        transport.receive_report()
+    stats = transport.stats()
+    assert stats["pending"] == 0
+    assert stats["high_water"] == 4
+    transport.remove()
+
+
+def test_high_water_sampled_by_the_market():
+    transport = LoopbackTransport(1)
+    for _ in range(2 * HIGH_WATER_SAMPLING):
+        transport.send_report(1, b"1")
+    for _ in range(2 * HIGH_WATER_SAMPLING):
+        transport.receive_report()
+    assert transport.stats()["high_water"] == 2 * HIGH_WATER_SAMPLING
+
+
+def ring_house(transport: RingTransport, house: int) -> None:
+    """
+    Plays a house of the ring transport : waits for its bill, then reports it
+    """
+    transport.send_report(house, transport.receive_bill(house))
+
+
+def test_ring_receivers_wake_up():
+    transport = RingTransport(nb_houses=2, ring_capacity=32)
+    houses = [Process(target=ring_house, args=(transport, house)) for house in (1, 2)]
+    for house in houses:
+        house.start()
+
+    # The houses sleep until their bill is written
+    transport.send_bill(2, b"-2.5")
+    assert transport.receive_report() == (b"-2.5", 2)
+    transport.send_bill(1, b"7")
+    assert transport.receive_report() == (b"7", 1)
+    for house in houses:
+        house.join(5)
+        assert house.exitcode == 0
+
+
+def pipe_house(transport: PipeTransport, house: int) -> None:
+    """
+    Plays a house of the pipe transport, with only its own ends open
+    """
+    transport.attach(range(house, house + 1))
+    transport.send_report(house, b"1")
+    transport.send_report(house, str(transport.reports[house][0].closed).encode())
+
+
+def test_pipe_attach():
+    transport = PipeTransport(3)
+    house = Process(target=pipe_house, args=(transport, 2))
+    house.start()
+    house.join(5)
+
+    assert transport.receive_report() == (b"1", 2)
+    assert transport.receive_report() == (b"True", 2)
+    transport.remove()
+
+
+def test_pipe_descriptors():
+    soft, hard = resource.getrlimit(resource.RLIMIT_NOFILE)
+    try:
+        nb_houses = 100
+        resource.setrlimit(resource.RLIMIT_NOFILE, (4 * nb_houses, hard))
+        PipeTransport.reserve_descriptors(PIPE_FDS_PER_HOUSE * nb_houses)
+        assert resource.getrlimit(resource.RLIMIT_NOFILE)[0] == 600
+    finally:
+        resource.setrlimit(resource.RLIMIT_NOFILE, (soft, hard))
+
+
+def test_ring_grouped_bills():
+    transport = RingTransport(nb_houses=4, ring_capacity=32, groups=[range(1, 4)])
+    assert len(transport.bills_ready) == 2
+
+    # The bill of house 1 wakes the process waiting for the one of house 3
+    transport.send_bill(1, b"1")
+    with pytest.raises(TransportBusy):
+        transport.receive_bill(3, block=False)
+    transport.send_bill(3, b"3")
+    transport.send_bill(2, b"2")
+    assert [transport.receive_bill(house) for house in (3, 2, 1)] == [b"3", b"2", b"1"]
+
+    # Every count was taken once
+    assert transport.credits == [0, 0]
+    assert not transport.bills_ready[0].acquire(False)
+    with pytest.raises(TransportBusy):
+        transport.receive_bill(4, block=False)